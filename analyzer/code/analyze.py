@@ -2,10 +2,11 @@ from pathlib import Path
 import argparse
 import os
 import pandas as pd
-from ampligraph.datasets.datasets import load_from_csv
-from ampligraph.evaluation import train_test_split_no_unseen
-from ampligraph.utils import restore_model
-from ampligraph.discovery import query_topn
+
+from export_model import export_path
+from scoring import SCORERS, NumpyModel, model_name, query_top_heads
+from splits import load_split
+from triple_store import load_triples
 
 
 def calc_men_women(entities, genders, occupation_mapping, occupation):
@@ -18,6 +19,15 @@ def calc_men_women(entities, genders, occupation_mapping, occupation):
     return men_with_occupation, women_with_occupation, non_people
 
 
+def load_model(model_path: Path):
+    # The NumPy export loads in a moment, restoring the model needs TensorFlow.
+    if export_path(model_path).is_file():
+        return NumpyModel(export_path(model_path))
+    from ampligraph.utils import restore_model
+
+    return restore_model(model_path)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Analyze a model")
     parser.add_argument("dataset", type=str, help="Name of the dataset to be analyzed")
@@ -41,7 +51,7 @@ if __name__ == "__main__":
         .parent.joinpath("experiments", args.dataset, args.version)
     ) 
 
-    model = restore_model(experiment_dir.joinpath(args.emb_model + "-model.amp"))
+    model = load_model(experiment_dir.joinpath(args.emb_model + "-model.amp"))
     gender_mapping, occ_mapping = {}, {}
     with open(source_dir.parent.joinpath("humans.txt"), "r", encoding="utf-8") as f:
         lines = f.read().splitlines()
@@ -52,12 +62,11 @@ if __name__ == "__main__":
                 gender_mapping[ent] = gender
                 occ_mapping[ent] = occupation
 
-    data = load_from_csv(source_dir, "triples.txt")
-    data_df = pd.DataFrame(data, columns=["s", "p", "o"])
-    data_occ = data_df[data_df.p == args.occupation_predicate]
+    triples = load_triples(source_dir.joinpath("triples.txt"))
+    data_occ = triples.to_frame(triples.with_predicate(args.occupation_predicate))
 
-    # Utilize the same seed as in run_ampli.py so we generate the same train/test split.
-    train, _ = train_test_split_no_unseen(data, test_size=0.2, seed=23891367)
+    # Load the train/test split saved by run_ampli.py.
+    train, _ = load_split(triples, source_dir)
     train_df = pd.DataFrame(train, columns=['s', 'p', 'o'])
     train_occ = train_df[train_df.p == args.occupation_predicate]
   
@@ -66,20 +75,30 @@ if __name__ == "__main__":
     all_entities = data_occ.s.unique()
 
     query_results = {}
-    for occupation in set(train_occ.o):  # Only use occupations actually in the dataset.
-        triples, scores = query_topn(
-            model,
-            100,
-            head=None,
-            relation=args.occupation_predicate,
-            tail=occupation,
-            ents_to_consider=list(train_entities), # Not casting to list gives a ValueError. 
-            # We allow any entity that was in the training set.
-            # This includes entities that are not people.
-        )
-        
-        genders = [gender_mapping.get(person, 'UNKNOWN') for person in triples[0:, 0]]
-        query_results[occupation] = {"triples": triples, "scores": scores, "genders": genders}
+    occupations = list(set(train_occ.o))  # Only use occupations actually in the dataset.
+    # We allow any entity that was in the training set as head.
+    # This includes entities that are not people.
+    if model_name(model) in SCORERS:
+        # Score all candidates against all occupations at once.
+        top_heads = query_top_heads(model, list(train_entities), args.occupation_predicate, occupations, 100)
+    else:
+        from ampligraph.discovery import query_topn
+
+        top_heads = {
+            occupation: query_topn(
+                model,
+                100,
+                head=None,
+                relation=args.occupation_predicate,
+                tail=occupation,
+                ents_to_consider=list(train_entities), # Not casting to list gives a ValueError. 
+            )
+            for occupation in occupations
+        }
+
+    for occupation, (top_triples, scores) in top_heads.items():
+        genders = [gender_mapping.get(person, 'UNKNOWN') for person in top_triples[0:, 0]]
+        query_results[occupation] = {"triples": top_triples, "scores": scores, "genders": genders}
 
     # Write results to file for analysis.
     for occupation, results in query_results.items():
@@ -0,0 +1,244 @@
+"""
+Local stand-in for the DBpedia SPARQL endpoint. The triples of DBpedia dump files
+(N-Triples, or the '.ttl' files DBpedia publishes, which hold one triple per line)
+are loaded once into a store on disk: every term is numbered, and the triples are
+kept as int32 arrays sorted in three orders, (s, p, o), (p, o, s) and (o, s, p).
+Any triple pattern is then answered by a binary search in one of these indexes,
+in-process and without the query size limits of the endpoint.
+
+Only the files with the facts extend_dbpedia.py asks for are needed: the instance
+types, labels, links to Wikidata (owl:sameAs) and infobox properties (dbp:*).
+
+    python3 dbpedia_store.py instance_types_en.ttl.bz2 labels_en.ttl.bz2 ... --target metadata/dbpedia_store
+
+extend_dbpedia.py uses the store instead of the endpoint when `DBPEDIA_STORE`
+points to it.
+"""
+import argparse
+import bz2
+import gzip
+import os
+import re
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+import numpy as np
+
+PREFIXES = {
+    "dbo": "http://dbpedia.org/ontology/",
+    "dbp": "http://dbpedia.org/property/",
+    "dbr": "http://dbpedia.org/resource/",
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+    "owl": "http://www.w3.org/2002/07/owl#",
+}
+RDF_TYPE = "<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>"
+RDFS_LABEL = "<http://www.w3.org/2000/01/rdf-schema#label>"
+OWL_SAME_AS = "<http://www.w3.org/2002/07/owl#sameAs>"
+
+# Position of s, p and o in every index, the index for a pattern is the one which
+# has the bound positions of the pattern first.
+INDEXES = {"spo": (0, 1, 2), "pos": (1, 2, 0), "osp": (2, 0, 1)}
+
+TRIPLE = re.compile(
+    r'^(<[^>]*>|_:\S+)\s+(<[^>]*>)\s+(<[^>]*>|_:\S+|"((?:[^"\\]|\\.)*)"(@[\w-]+|\^\^<[^>]*>)?)\s*\.\s*$'
+)
+ESCAPE = re.compile(r'\\(U[0-9A-Fa-f]{8}|u[0-9A-Fa-f]{4}|.)')
+ESCAPES = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f", '"': '"', "'": "'", "\\": "\\"}
+
+
+def unescape(lexical: str) -> str:
+    return ESCAPE.sub(lambda m: chr(int(m.group(1)[1:], 16)) if m.group(1)[0] in "uU" else ESCAPES.get(m.group(1), m.group(1)), lexical)
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r")
+
+
+def literal(value: str, suffix: str = "") -> str:
+    """The term of a literal, e.g. literal("Emilia Fox", "@en")."""
+    return f'"{escape(value)}"{suffix}'
+
+
+def resolve(name: str) -> str:
+    """The term of a uri, which may be written as '<uri>', 'prefix:name' or in full."""
+    if name.startswith("<"):
+        return name
+    prefix, _, local = name.partition(":")
+    if prefix in PREFIXES:
+        return f"<{PREFIXES[prefix]}{local}>"
+    return f"<{name}>"
+
+
+def term_value(term: str) -> str:
+    """The value of a term, as in the results of a SPARQL query."""
+    if term.startswith("<"):
+        return term[1:-1]
+    if term.startswith('"'):
+        return unescape(term[1:term.rindex('"')])
+    return term
+
+
+def open_text(path: Path) -> TextIO:
+    if path.suffix == ".bz2":
+        return bz2.open(path, "rt", encoding="utf-8")
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def read_triples(path: Path) -> Iterator[Tuple[str, str, str]]:
+    """The triples in a file, with every literal in the same (minimal) escaping."""
+    with open_text(path) as f:
+        for line in f:
+            match = TRIPLE.match(line)
+            if match is None:
+                continue  # Comments, blank or malformed lines.
+            s, p, o, lexical, suffix = match.groups()
+            if lexical is not None:
+                o = literal(unescape(lexical), suffix or "")
+            yield s, p, o
+
+
+def build_store(sources: List[Path], target: Path) -> int:
+    """Number the terms of all triples and write the three indexes, returns the # triples."""
+    terms: Dict[str, int] = {}
+    columns = [array("i"), array("i"), array("i")]
+    for source in sources:
+        print(f"Reading {source}")
+        for triple in read_triples(source):
+            for column, term in zip(columns, triple):
+                column.append(terms.setdefault(term, len(terms)))
+
+    triples = np.array([np.frombuffer(column, dtype=np.int32) for column in columns]).reshape(3, -1)
+    # Duplicate triples (e.g. in several files) are stored once.
+    triples = np.unique(triples, axis=1)
+
+    target.mkdir(parents=True, exist_ok=True)
+    with open(target.joinpath("terms.txt"), "w", encoding="utf-8") as f:
+        for term in terms:
+            f.write(term + "\n")
+    for name, order in INDEXES.items():
+        # lexsort sorts on the last key first.
+        index = triples[:, np.lexsort([triples[position] for position in reversed(order)])]
+        np.save(target.joinpath(f"{name}.npy"), np.ascontiguousarray(index[list(order)]))
+    return triples.shape[1]
+
+
+class TripleStore:
+    def __init__(self, path: Path):
+        with open(path.joinpath("terms.txt"), "r", encoding="utf-8") as f:
+            self.terms: List[str] = f.read().split("\n")[:-1]
+        self.ids: Dict[str, int] = {term: i for i, term in enumerate(self.terms)}
+        # Plain views of the memory maps, which are much faster to slice.
+        self.indexes = {name: np.asarray(np.load(path.joinpath(f"{name}.npy"), mmap_mode="r")) for name in INDEXES}
+
+    def id(self, term: str) -> Optional[int]:
+        return self.ids.get(term)
+
+    def match(self, s: Optional[int] = None, p: Optional[int] = None, o: Optional[int] = None) -> np.ndarray:
+        """The triples matching a pattern as a (3, n) array of s, p and o ids,
+        with None for the unbound positions."""
+        pattern = (s, p, o)
+        bound = {position for position, value in enumerate(pattern) if value is not None}
+        for name, order in INDEXES.items():
+            if set(order[: len(bound)]) == bound:
+                break
+
+        index = self.indexes[name]
+        lo, hi = 0, index.shape[1]
+        for row, position in enumerate(order[: len(bound)]):
+            column = index[row, lo:hi]
+            # As int32, a Python int would make searchsorted convert the whole column.
+            value = np.int32(pattern[position])
+            lo, hi = lo + int(column.searchsorted(value, "left")), lo + int(column.searchsorted(value, "right"))
+        # Back to the (s, p, o) order.
+        return np.asarray(index[:, lo:hi])[[order.index(position) for position in range(3)]]
+
+    def objects(self, s: int, p: int) -> List[int]:
+        return self.match(s=s, p=p)[2].tolist()
+
+    def wikidata_links(self, s: int) -> List[str]:
+        same_as = self.id(OWL_SAME_AS)
+        if same_as is None:
+            return []
+        links = (term_value(self.terms[o]) for o in self.objects(s, same_as))
+        return [link for link in links if "wikidata" in link]
+
+    def persons(self, entities: List[str], entity_types: List[str]) -> Dict[str, Dict[str, str]]:
+        """The persons among the entities, found by their english label, which are
+        of one of the types. Answers the same as `person_query` in extend_dbpedia.py."""
+        type_ids = {self.id(resolve(name)) for name in entity_types} - {None}
+        rdf_type, rdfs_label = self.id(RDF_TYPE), self.id(RDFS_LABEL)
+        results: Dict[str, Dict[str, str]] = {}
+        if rdf_type is None or rdfs_label is None:
+            return results
+
+        for entity in entities:
+            label = entity.split("/resource/").pop().replace("_", " ")
+            label_id = self.id(literal(label, "@en"))
+            if label_id is None:
+                continue
+            for subject in self.match(p=rdfs_label, o=label_id)[0].tolist():
+                types = [t for t in self.objects(subject, rdf_type) if t in type_ids]
+                if len(types) == 0:
+                    continue
+                person = {"id": term_value(self.terms[subject]), "label": label,
+                    "types": ", ".join(term_value(self.terms[t]) for t in types)}
+                links = self.wikidata_links(subject)
+                if len(links) > 0:
+                    person["wdLink"] = links[0]
+                results[person["id"]] = person
+        return results
+
+    def type_properties(self, p_type: str, properties: List[str], limit: int) -> List[Dict[str, Dict[str, str]]]:
+        """Up to `limit` entities of a type which are linked to Wikidata, with the
+        first value of each of the (dbp:) properties they have. Rows are shaped like
+        SPARQL result bindings, the value of `properties[i]` is under str(i)."""
+        rdf_type, type_id = self.id(RDF_TYPE), self.id(resolve(f"dbo:{p_type}"))
+        if rdf_type is None or type_id is None:
+            return []
+        wanted = {self.id(resolve(f"dbp:{prop}")): str(i) for i, prop in enumerate(properties)}
+        wanted.pop(None, None)
+
+        rows: List[Dict[str, Dict[str, str]]] = []
+        for item in self.match(p=rdf_type, o=type_id)[0].tolist():
+            links = self.wikidata_links(item)
+            if len(links) == 0:
+                continue
+            row = {"item": {"type": "uri", "value": term_value(self.terms[item])}, "wdLink": {"type": "uri", "value": links[0]}}
+            _, predicates, objects = self.match(s=item)
+            for predicate, obj in zip(predicates.tolist(), objects.tolist()):
+                key = wanted.get(predicate)
+                if key is not None and key not in row:
+                    row[key] = {"value": term_value(self.terms[obj])}
+            rows.append(row)
+            if len(rows) == limit:
+                break
+        return rows
+
+
+_store: Optional[TripleStore] = None
+
+
+def get_store() -> Optional[TripleStore]:
+    """The store configured by `DBPEDIA_STORE`, or None to use the endpoint."""
+    global _store
+    if _store is None and os.environ.get("DBPEDIA_STORE"):
+        path = Path(os.environ["DBPEDIA_STORE"])
+        print(f"Answering DBpedia queries from {path}.")
+        _store = TripleStore(path)
+    return _store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load DBpedia dump files into a local triple store")
+    parser.add_argument("sources", type=Path, nargs="+", help="N-Triples files, may be compressed with bz2 or gzip")
+    parser.add_argument("--target", type=Path, help="Folder of the store", default=Path("metadata", "dbpedia_store"))
+    args = parser.parse_args()
+
+    start = time.time()
+    count = build_store(args.sources, args.target)
+    print(f"Stored {count:,} triples in {args.target} in {time.time() - start:.0f} seconds")
@@ -0,0 +1,50 @@
+"""
+Export a trained ampligraph model ('.amp') to a NumPy file ('.npz') holding the
+entity and relation embeddings, their labels, the model name and its parameters.
+analyze.py scores triples from this file with scoring.py, so it does not need
+TensorFlow or ampligraph. run_ampli.py exports every model it saves, an older
+model is exported with:
+
+    py export_model.py ../experiments/wikidata12k/original/transe-model.amp
+"""
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+from scoring import SCORERS
+
+
+def export_path(model_path: Path) -> Path:
+    return model_path.with_suffix(".npz")
+
+
+def export_model(model, target: Path) -> None:
+    name = type(model).__name__
+    if name not in SCORERS:
+        print(f"Not exporting {name}, there is no NumPy scoring function for it.")
+        return
+
+    entities = np.array(list(model.ent_to_idx.keys()), dtype=str)
+    relations = np.array(list(model.rel_to_idx.keys()), dtype=str)
+    np.savez(
+        target,
+        model=name,
+        params=json.dumps(model.embedding_model_params, default=str),
+        entities=entities,
+        relations=relations,
+        entity_emb=model.get_embeddings(entities, embedding_type="entity"),
+        relation_emb=model.get_embeddings(relations, embedding_type="relation"),
+    )
+    print(f"Exported {name} with {len(entities)} entities and {len(relations)} relations to {target}.")
+
+
+if __name__ == "__main__":
+    from ampligraph.utils import restore_model
+
+    parser = argparse.ArgumentParser(description="Export a trained model to NumPy")
+    parser.add_argument("model", type=Path, help="Path of the '.amp' model")
+    args = parser.parse_args()
+
+    export_model(restore_model(str(args.model)), export_path(args.model))
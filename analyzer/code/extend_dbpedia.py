@@ -11,7 +11,6 @@ We add these triples to the KG, this becomes the 'original' graph.
 """
 
 import pandas as pd
-import requests
 import pickle
 from helper import (
     get_path,
@@ -21,17 +20,14 @@ from helper import (
     check_num_outlinks,
     get_gender_balance,
 )
+from dbpedia_store import get_store
+from sparql import get_client as get_sparql_client
+from triple_store import load_triples
 from typing import List, Dict
 from collections import Counter
 from random import sample
 
-DBPEDIA_URL_START = (
-    "https://dbpedia.org/sparql?default-graph-uri=http://dbpedia.org&query="
-)
-DBPEDIA_URL_END = "&format=application%2Fsparql-results%2Bjson&timeout=60000&signal_void=on&signal_unconnected=on"
-
-
-def call_dbpedia_query(entities: List[str], entity_types: List) -> Dict:
+def person_query(entities: List[str], entity_types: List) -> str:
     """
     This humongous thing is the SPARQL query used to fetch all the 'people' from
     DBPedia that are in the given categories. Strangely enough, occupations like PlayboyPlaymate
@@ -45,11 +41,10 @@ def call_dbpedia_query(entities: List[str], entity_types: List) -> Dict:
         }
     """
     query_start = (
-        DBPEDIA_URL_START
-        + 'SELECT DISTINCT ?id ?label ?wdLink (GROUP_CONCAT(DISTINCT ?type; SEPARATOR=", ") AS ?types)'
+        'SELECT DISTINCT ?id ?label ?wdLink (GROUP_CONCAT(DISTINCT ?type; SEPARATOR=", ") AS ?types)'
         + " WHERE { ?id rdf:type ?type. ?id rdfs:label ?label ."
         + " FILTER (?type IN ( "
-        +  requests.utils.quote(",".join(entity_types))
+        + ",".join(entity_types)
         + " ) )"
         + " FILTER (?label IN ( "
     )  # "Anky van Grunsven"@en, "Emilia Fox"@en, "Ross Barkley"@e ... entities go here
@@ -57,7 +52,6 @@ def call_dbpedia_query(entities: List[str], entity_types: List) -> Dict:
         ") )"
         + ' OPTIONAL { ?id owl:sameAs ?wdLink . FILTER CONTAINS(STR(?wdLink),"wikidata") } }'
         + " GROUP BY ?id ?label ?wdLink"
-        + DBPEDIA_URL_END
     )
 
     # First convert all to labels.
@@ -68,20 +62,25 @@ def call_dbpedia_query(entities: List[str], entity_types: List) -> Dict:
         ent_strings.append(ent)
 
     ent_string = ",".join(list(map(lambda x: f'"{x}"@en', ent_strings)))
-    ent_string = requests.utils.quote(ent_string)
-    query = query_start + ent_string + query_end
+    return query_start + ent_string + query_end
 
-    r = requests.get(url=query)
-    r_data = r.json()
 
+def read_persons(bindings: List[Dict]) -> Dict:
     results = {}
-    for result in r_data["results"]["bindings"]:
+    for result in bindings:
         # Only people are actually returned. So we can assume this result is a person.
         person = {k: v["value"] for k, v in result.items()}
         results[person["id"]] = person
 
     return results
 
+
+def call_dbpedia_query(entities: List[str], entity_types: List) -> Dict:
+    store = get_store()
+    if store is not None:
+        return store.persons(entities, entity_types)
+    return read_persons(get_sparql_client().query(person_query(entities, entity_types)))
+
 def lookup_wd_occ_gender(people : Dict, genders: Dict, occupations: Dict, wd_db_map: Dict, filename: str):
     """ Look-up peoples occupation and gender on Wikidata. `people` argument should
      be the DBpedia entity data. Variables are edited in place.
@@ -97,21 +96,17 @@ def lookup_wd_occ_gender(people : Dict, genders: Dict, occupations: Dict, wd_db_
             wd_db_map = data['wd_to_db']
             return genders, occupations, wd_db_map
 
-    query_group = []
-    for i, dbpedia_ent in enumerate(people.values()):
+    for dbpedia_ent in people.values():
         wd_id = dbpedia_ent["wdLink"].split("/entity/").pop()
         wd_db_map[wd_id] = dbpedia_ent["id"]
-        query_group.append(wd_id)
-
-        if i == len(people) - 1 or len(query_group) == 50:
-            result = call_wikidata_api(query_group, ["P106", "P21"])
-            for ent, entdata in result.items():
-                if "P21" in entdata:
-                    genders[wd_db_map[ent]] = entdata["P21"]
-                if "P106" in entdata:
-                    occupations[wd_db_map[ent]] = entdata["P106"]
-            query_group = []  # Reset query
-            print(f"Queried {i} out of {len(people)} entities.")
+
+    result = call_wikidata_api(list(wd_db_map.keys()), ["P106", "P21"])
+    for ent, entdata in result.items():
+        if "P21" in entdata:
+            genders[wd_db_map[ent]] = entdata["P21"]
+        if "P106" in entdata:
+            occupations[wd_db_map[ent]] = entdata["P106"]
+    print(f"Queried {len(people)} entities.")
     
     # Write output to file.
     with open(local_file, "wb") as f:
@@ -149,16 +144,13 @@ def count_balance(from_df, gender_info: Dict):
 ###
 ###
 location = ["data", "dbpedia"]
-data = pd.read_table(
-    get_path(*location, "raw", "triples.txt"), header=None, names=["s", "p", "o"]
-)
-data = data.drop_duplicates(ignore_index=True)
+triples = load_triples(get_path(*location, "raw", "triples.txt"))
+data = triples.to_frame()
 random_state = get_random_state()
 
 # Remove all predicates which occur less than 50 times.
-preds_to_remove = set(
-    map(lambda x: x[0], filter(lambda x: x[1] < 50, data.p.value_counts().iteritems()))
-)
+predicate_counts = triples.predicate_counts()
+preds_to_remove = set(predicate_counts.index[predicate_counts < 50])
 
 removed_triples = data[data.p.isin(preds_to_remove)]
 print(f"Removing {len(preds_to_remove)} predicates and {len(removed_triples)} triples.")
@@ -176,18 +168,16 @@ with open(get_path('metadata', 'dbpedia_persontypes.txt'), 'r') as f:
     entity_types = f.read().splitlines()
 
 if not metadata_file.is_file():
-    query_group = []
     print("Fetching metadata from dbpedia.")
-    for i in range(len(entities)):
-        query_group.append(entities[i])
-        # Query 100 entities at a time.
-        if i == len(entities) - 1 or len(query_group) == 100:
-            result = call_dbpedia_query(query_group, entity_types)
-
-            entity_data.update(result)
-
-            query_group = []  # Reset query
-            print(f"Queried {i} out of {len(entities)} entities.")
+    # Query 100 entities at a time. Every completed query is cached, so a failed
+    # run continues where it stopped.
+    store = get_store()
+    if store is not None:
+        entity_data.update(store.persons(list(entities), entity_types))
+    else:
+        queries = [person_query(entities[i : i + 100], entity_types) for i in range(0, len(entities), 100)]
+        for bindings in get_sparql_client().query_many(queries):
+            entity_data.update(read_persons(bindings))
     # Dump to file.
     with open(metadata_file, "wb") as f:
         pickle.dump(entity_data, f)
@@ -271,12 +261,20 @@ if not local_file.is_file():
             local, prev = "", i
         local += f" OPTIONAL {{ ?item dbp:{item} ?{item_id} }} "
 
-    # Perform actual querying.
+    # Perform actual querying. The queries of all types and groups are run concurrently,
+    # and their results are processed in order. A local store has no limit on the # variables,
+    # so it answers a single 'query' per type.
+    queries, query_types, results = [], [], []
+    store = get_store()
     for persontype, missing_amount in missing.items():
         p_type = persontype.split("/resource/").pop()
         if missing_amount < 100:
             continue
         print(f"Fetching information for type {p_type}")
+        if store is not None:
+            results.append(store.type_properties(p_type, list(pred_names), missing_amount * 3))
+            query_types.append(p_type)
+            continue
 
         for i in range(len(pred_groups)):
             query = f"SELECT DISTINCT ?item ?wdLink " + pred_ids[i]
@@ -287,27 +285,26 @@ if not local_file.is_file():
             query += pred_groups[i]
             query += "} GROUP BY ?item ?wdLink"
             query += f" LIMIT {missing_amount* 3}" # With a buffer, because there are more men than women.
-
-            url = DBPEDIA_URL_START +  requests.utils.quote(query) + DBPEDIA_URL_END
-
-            r = requests.get(url=url)
-            r_data = r.json() 
-
-            q_results = r_data['results']['bindings']
-            for q_res in q_results:
-                name = q_res['item']['value']
-                if name not in additional_info:
-                    additional_info[name] = {
-                        'id' : name,
-                        'wdLink' : q_res['wdLink']['value'],
-                        'occupation' : p_type
-                        }
-                
-                for k,v in q_res.items():
-                    if k == 'item' or k == 'wdLink': # We handled it above.
-                        continue
-                    pred = people_preds[int(k)] # Map predicate back from id to name.
-                    additional_info[name][pred] = v['value'] 
+            queries.append(query)
+            query_types.append(p_type)
+
+    if store is None:
+        results = get_sparql_client().query_many(queries)
+    for p_type, q_results in zip(query_types, results):
+        for q_res in q_results:
+            name = q_res['item']['value']
+            if name not in additional_info:
+                additional_info[name] = {
+                    'id' : name,
+                    'wdLink' : q_res['wdLink']['value'],
+                    'occupation' : p_type
+                    }
+            
+            for k,v in q_res.items():
+                if k == 'item' or k == 'wdLink': # We handled it above.
+                    continue
+                pred = people_preds[int(k)] # Map predicate back from id to name.
+                additional_info[name][pred] = v['value'] 
     with open(local_file, "wb") as f:
         pickle.dump(additional_info, f)
 else:
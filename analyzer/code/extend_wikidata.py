@@ -8,6 +8,7 @@ can be created by running the code in the bias-profiling repository.
 """
 
 import pandas as pd
+from raw_dataset import load_raw_dataset
 from helper import (
     get_path,
     get_random_state,
@@ -18,34 +19,10 @@ from helper import (
 
 location = ["data", "wikidata12k"]
 
-# Read in train, test validation sets.
-data = pd.DataFrame([], columns=["s", "p", "o", "tb", "te"])
-sets = ['train.txt', 'test.txt','valid.txt']
-for d_set in sets:
-    data = pd.concat([data, pd.read_table(
-        get_path(*location, "raw", d_set),
-        header=None,
-        names=["s", "p", "o", "tb", "te"],
-    )], axis=0, ignore_index=True)
-
-data = data.drop(['tb', 'te'], axis=1)
-data = data.drop_duplicates(ignore_index=True)
-
-# Convert ids to Wikidata ids.
-ents =  pd.read_csv(get_path(*location, "raw", "entities.txt"), sep="\t", header=None, names=['id', 'name'])
-rels =  pd.read_csv(get_path(*location, "raw", "relations.txt"), sep="\t", header=None, names=['id', 'name'])
-
-ent_dict = {}
-for idx, row in ents.iterrows():
-    ent_dict[row.id] = row['name']
-
-rel_dict = {}
-for idx, row in rels.iterrows():
-    rel_dict[row.id] = row['name']
-
-data['p'] = data.p.apply(lambda x: rel_dict[x])
-data['s'] = data.s.apply(lambda x: ent_dict[x])
-data['o'] = data.o.apply(lambda x: ent_dict[x])
+# Read in train, test validation sets, with the ids converted to Wikidata ids.
+dataset = load_raw_dataset(get_path(*location, "raw"))
+print(f"Loaded {len(dataset.triples)} triples in " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in dataset.timings.items()))
+data = dataset.to_frame()
 
 random_state = get_random_state()
 
@@ -55,18 +32,13 @@ occupations = {}
 # 1) Extend wikidata dataset by adding occupation triples for all the men/women that are
 # already in the dataset. Wikidata12k originally does not have P106.
 all_entities = data.s.append(data.o).unique()
-query_group = []
-for i in range(len(all_entities)):
-    query_group.append(all_entities[i])
-    if i == len(all_entities) - 1 or len(query_group) == 50:
-        result = call_wikidata_api(query_group, ["P106", "P21"])
-        for ent, entdata in result.items():
-            if "P21" in entdata:
-                genders[ent] = entdata["P21"]
-            if "P106" in entdata:
-                occupations[ent] = entdata["P106"]
-        query_group = []  # Reset query
-        print(f"Queried {i} out of {len(all_entities)} entities.")
+result = call_wikidata_api(all_entities, ["P106", "P21"])
+for ent, entdata in result.items():
+    if "P21" in entdata:
+        genders[ent] = entdata["P21"]
+    if "P106" in entdata:
+        occupations[ent] = entdata["P106"]
+print(f"Queried {len(all_entities)} entities.")
 
 occ_triples = []
 for ent, occ in occupations.items():
@@ -92,9 +64,9 @@ extra_triples = pd.read_table(
     names=["s", "p", "o"],
 )
 
-for idx, row in extra_triples[extra_triples.p == "P106"].iterrows():
-    genders[row.s] = "Q6581072"
-    occupations[row.s] = row.o
+extra_occupations = extra_triples[extra_triples.p == "P106"]
+genders.update(dict.fromkeys(extra_occupations.s, "Q6581072"))
+occupations.update(zip(extra_occupations.s, extra_occupations.o))
 
 # Create new balanced_df by adding the extra female triples. Then shuffle it.
 balanced_df = pd.concat([data, extra_triples]).reset_index(drop=True)
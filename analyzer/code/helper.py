@@ -1,7 +1,9 @@
 from typing import Dict, Optional, Set, List, Tuple
 from pathlib import Path
 import os
-import requests
+
+from people_table import get_people_table
+from wikidata_api import get_client
 
 
 def get_gender_balance(all_ents: Set, genders: Dict, what: str) -> Tuple[Set, Set]:
@@ -20,14 +22,17 @@ def read_wd_claim(pred_claims: Optional[Dict]):
 
 
 def call_wikidata_api(entity_ids: List[str], predicates: List[str]):
-    url = "https://www.wikidata.org/w/api.php?action=wbgetentities&ids="
+    """Look up the predicates of the humans among the entities, any number of
+    entities at once. See wikidata_api.py for how they are fetched, and
+    people_table.py for answering from the dump instead."""
+    people = get_people_table()
+    if people is not None:
+        return people.lookup(entity_ids, predicates)
 
-    target = url + "|".join(entity_ids) + "&format=json"
-    r = requests.get(url=target)
-    r_data = r.json()
+    entities = get_client().get_entities(entity_ids)
 
     entity_data: Dict[str, Dict[str, str]] = {}
-    for id, ent in r_data["entities"].items():
+    for id, ent in entities.items():
         claims = ent.get("claims")
 
         if claims is None:
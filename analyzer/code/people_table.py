@@ -0,0 +1,56 @@
+"""
+Offline lookup of the gender and occupation of humans. The people parser of the
+bias-profiling repository reads these for every human in the Wikidata dump, and
+its people_to_tsv.py writes them as a table. When that table is present, it
+answers the lookups of `call_wikidata_api` instead of the Wikidata API, with the
+same result: only humans are returned, with the first value of every predicate.
+
+The table is read from `WIKIDATA_PEOPLE` if set, otherwise from
+metadata/people.tsv if that exists.
+"""
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+# The predicates in the table, and their column.
+PREDICATES = {"P21": "gender", "P106": "occupation"}
+
+
+class PeopleTable:
+    def __init__(self, path: Path):
+        self.table = pd.read_csv(
+            path,
+            sep="\t",
+            usecols=["id", *PREDICATES.values()],
+            index_col="id",
+            dtype=str,
+            keep_default_na=False,
+        )
+        # A person which is in the table twice counts as last seen.
+        self.table = self.table[~self.table.index.duplicated(keep="last")]
+
+    def lookup(self, entity_ids: Iterable[str], predicates: List[str]) -> Dict[str, Dict[str, str]]:
+        unknown = [pred for pred in predicates if pred not in PREDICATES]
+        if len(unknown) > 0:
+            raise ValueError(f"The people table has no {unknown}, only {list(PREDICATES)}")
+
+        found = self.table.reindex(pd.unique(pd.Series(list(entity_ids), dtype=object))).dropna()
+        found = found[[PREDICATES[pred] for pred in predicates]].replace("", "unknown")
+        return {id: dict(zip(predicates, values)) for id, *values in found.itertuples()}
+
+
+_table: Optional[PeopleTable] = None
+
+
+def get_people_table() -> Optional[PeopleTable]:
+    """The table configured by the environment, or None to use the API."""
+    global _table
+    if _table is None:
+        path = Path(os.environ.get("WIKIDATA_PEOPLE", os.path.join("metadata", "people.tsv")))
+        if not path.is_file():
+            return None
+        print(f"Looking up people in {path} instead of on Wikidata.")
+        _table = PeopleTable(path)
+    return _table
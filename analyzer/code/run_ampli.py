@@ -1,6 +1,4 @@
 from posixpath import abspath
-import subprocess
-import sys
 import argparse
 import os
 import math
@@ -9,17 +7,19 @@ import numpy as np
 from pathlib import Path
 from typing import Dict
 
-from ampligraph.datasets import load_from_csv
 from ampligraph.latent_features import TransE, ComplEx
 from ampligraph.evaluation import (
     evaluate_performance,
     mr_score,
     mrr_score,
     hits_at_n_score,
-    train_test_split_no_unseen
 )
 from ampligraph.utils import save_model, restore_model
 
+from export_model import export_model, export_path
+from splits import METHODS, load_split
+from triple_store import load_triples
+
 def init_model(name, batch_count:int ):
     if name == 'transe':
         return TransE(
@@ -59,13 +59,6 @@ def evaluate(model, test, others) -> Dict[str, float]:
 
 
 if __name__ == "__main__":
-    subprocess.check_call(
-        [sys.executable, "-m", "pip", "-q", "install", "tensorflow==1.15.0"]
-    )
-    subprocess.check_call(
-        [sys.executable, "-m", "pip", "-q", "install", "ampligraph==1.4.0"]
-    )
-
     parser = argparse.ArgumentParser(description="KG embedding model training/testing script.")
     parser.add_argument("dataset", type=str, help="Name of the dataset to be imported")
     parser.add_argument(
@@ -80,6 +73,12 @@ if __name__ == "__main__":
         help="Skip training: just load an existing model and test it",
         default=False,
     )
+    parser.add_argument(
+        "--split",
+        choices=METHODS,
+        help="How to compute the train/test split, if it was not saved yet. 'native' is faster on large graphs",
+        default="ampligraph",
+    )
     args = parser.parse_args()
 
     source_dir = (
@@ -94,8 +93,9 @@ if __name__ == "__main__":
         .parent.joinpath("experiments", args.dataset, args.version)
     )
 
-    data = load_from_csv(source_dir, "triples.txt")
-    train, test = train_test_split_no_unseen(data, test_size=0.2, seed=23891367)
+    # The split is saved, so analyze.py uses the same one.
+    triples = load_triples(source_dir.joinpath("triples.txt"))
+    train, test = load_split(triples, source_dir, method=args.split)
     print(f"Train size: {len(train)}")
     print(f"Test size: {len(test)}")
 
@@ -107,5 +107,7 @@ if __name__ == "__main__":
         model = init_model(args.model, batch_count)
         model.fit(train)
         save_model(model, model_path)
+        # analyze.py scores with the NumPy export, without TensorFlow.
+        export_model(model, export_path(model_path))
     
     evaluate(model, test, train)
\ No newline at end of file
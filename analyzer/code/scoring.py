@@ -0,0 +1,142 @@
+"""
+Scoring and ranking of triples with NumPy, from the embeddings of a trained model.
+The scoring functions are those of ampligraph (higher is more plausible), but score
+many heads against many tails at once as a matrix product or broadcast, instead of
+one triple at a time.
+
+The embeddings come either from an ampligraph model, or from the NumPy export of
+a model made by export_model.py. `NumpyModel` loads such an export, and scores
+and ranks triples without TensorFlow or ampligraph.
+"""
+import json
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+# Bound on the size of the intermediate arrays, in # floats.
+MAX_BLOCK = 2 ** 25
+
+
+def transe_scores(heads: np.ndarray, relation: np.ndarray, tails: np.ndarray, params: Dict) -> np.ndarray:
+    """-||h + r - t|| for every (tail, head) pair."""
+    if params.get("normalize_ent_emb", False):
+        heads = heads / np.linalg.norm(heads, axis=1, keepdims=True)
+        tails = tails / np.linalg.norm(tails, axis=1, keepdims=True)
+    translated = heads + relation
+    norm = params.get("norm", 1)
+    scores = np.empty((len(tails), len(heads)), dtype=np.float32)
+    # Broadcasting builds a (tails, heads, k) array, so do it for a block of tails at a time.
+    block = max(1, MAX_BLOCK // max(1, translated.size))
+    for i in range(0, len(tails), block):
+        scores[i : i + block] = -np.linalg.norm(translated[None, :, :] - tails[i : i + block, None, :], ord=norm, axis=2)
+    return scores
+
+
+def distmult_scores(heads: np.ndarray, relation: np.ndarray, tails: np.ndarray, params: Dict) -> np.ndarray:
+    """<h, r, t> for every (tail, head) pair."""
+    return tails @ (heads * relation).T
+
+
+def complex_product(heads: np.ndarray, relations: np.ndarray) -> np.ndarray:
+    """h * r, of embeddings holding the real parts followed by the imaginary parts."""
+    k = heads.shape[-1] // 2
+    h_re, h_im, r_re, r_im = heads[..., :k], heads[..., k:], relations[..., :k], relations[..., k:]
+    return np.concatenate([h_re * r_re - h_im * r_im, h_re * r_im + h_im * r_re], axis=-1)
+
+
+def complex_scores(heads: np.ndarray, relation: np.ndarray, tails: np.ndarray, params: Dict) -> np.ndarray:
+    """Re(<h, r, conj(t)>) for every (tail, head) pair, which is the dot product
+    of h * r with (t_re, t_im)."""
+    return tails @ complex_product(heads, relation).T
+
+
+SCORERS: Dict[str, Callable[[np.ndarray, np.ndarray, np.ndarray, Dict], np.ndarray]] = {
+    "TransE": transe_scores,
+    "DistMult": distmult_scores,
+    "ComplEx": complex_scores,
+}
+
+
+def triple_scores(model_name: str, params: Dict, heads: np.ndarray, relations: np.ndarray, tails: np.ndarray) -> np.ndarray:
+    """The score of every (h, r, t) row."""
+    if model_name == "TransE":
+        if params.get("normalize_ent_emb", False):
+            heads = heads / np.linalg.norm(heads, axis=1, keepdims=True)
+            tails = tails / np.linalg.norm(tails, axis=1, keepdims=True)
+        return -np.linalg.norm(heads + relations - tails, ord=params.get("norm", 1), axis=1)
+    if model_name == "DistMult":
+        return np.sum(heads * relations * tails, axis=1)
+    if model_name == "ComplEx":
+        return np.sum(complex_product(heads, relations) * tails, axis=1)
+    raise ValueError(f"No scoring function for {model_name}, only for {list(SCORERS)}")
+
+
+def top_n(scores: np.ndarray, n: int) -> np.ndarray:
+    """Per row, the columns of the n highest scores, from the highest down."""
+    n = min(n, scores.shape[1])
+    top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    # Ties are ordered with the last column first, like a reversed argsort.
+    order = np.lexsort((-top, -top_scores), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def rank_heads(model_name: str, params: Dict, heads: np.ndarray, relation: np.ndarray, tails: np.ndarray,
+        n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """For every tail, the n best scoring heads (as indices into `heads`) and their scores."""
+    scores = SCORERS[model_name](heads, relation, tails, params)
+    top = top_n(scores, n)
+    return top, np.take_along_axis(scores, top, axis=1)
+
+
+def model_name(model) -> str:
+    """Name of the model (e.g. 'TransE') of an ampligraph or NumPy model."""
+    return model.name if isinstance(model, NumpyModel) else type(model).__name__
+
+
+class NumpyModel:
+    """A model exported by export_model.py, with the methods of an ampligraph
+    model that are needed to score triples."""
+
+    def __init__(self, path: Path):
+        export = np.load(path, allow_pickle=False)
+        self.name = str(export["model"])
+        self.embedding_model_params: Dict = json.loads(str(export["params"]))
+        self.entity_emb, self.relation_emb = export["entity_emb"], export["relation_emb"]
+        self.ent_to_idx = {entity: i for i, entity in enumerate(export["entities"].tolist())}
+        self.rel_to_idx = {relation: i for i, relation in enumerate(export["relations"].tolist())}
+
+    def get_embeddings(self, entities, embedding_type: str = "entity") -> np.ndarray:
+        if embedding_type == "entity":
+            return self.entity_emb[[self.ent_to_idx[entity] for entity in entities]]
+        return self.relation_emb[[self.rel_to_idx[relation] for relation in entities]]
+
+    def predict(self, triples: np.ndarray) -> np.ndarray:
+        """The score of every (s, p, o) triple, as with ampligraph's `predict`."""
+        triples = np.asarray(triples, dtype=object).reshape(-1, 3)
+        return triple_scores(
+            self.name,
+            self.embedding_model_params,
+            self.get_embeddings(triples[:, 0], "entity"),
+            self.get_embeddings(triples[:, 1], "relation"),
+            self.get_embeddings(triples[:, 2], "entity"),
+        )
+
+
+def query_top_heads(model, candidates: List[str], relation: str, tails: List[str],
+        n: int) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """Like ampligraph's `query_topn` with only the head missing, for all tails at
+    once: per tail the n best (head, relation, tail) triples and their scores."""
+    candidates = np.asarray(candidates, dtype=object)
+    heads = model.get_embeddings(candidates, embedding_type="entity")
+    relation_emb = model.get_embeddings(np.array([relation]), embedding_type="relation")[0]
+    tail_emb = model.get_embeddings(np.asarray(tails, dtype=object), embedding_type="entity")
+    top, scores = rank_heads(model_name(model), model.embedding_model_params, heads, relation_emb, tail_emb, n)
+
+    results = {}
+    for i, tail in enumerate(tails):
+        best = candidates[top[i]]
+        triples = np.column_stack([best, np.full(len(best), relation, dtype=object), np.full(len(best), tail, dtype=object)])
+        results[tail] = (triples, scores[i])
+    return results
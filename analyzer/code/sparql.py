@@ -0,0 +1,236 @@
+"""
+Client for the DBpedia SPARQL endpoint, used by extend_dbpedia.py. A list of
+queries is run concurrently, with a bounded number in flight under a rate limit,
+and failed requests are retried with exponential backoff. The result of every
+query is stored in an on-disk cache as soon as it completes, keyed by the query,
+so a run which fails halfway continues where it stopped when it is started again.
+
+For offline runs, the client can answer from a fixtures file (json lines, one
+query with its result bindings per line) instead of the endpoint. The same file
+can be served as a stand-in for the endpoint, to benchmark the fetching locally:
+
+    python3 sparql.py export metadata/dbpedia_cache.db fixtures.jsonl
+    python3 sparql.py serve fixtures.jsonl --port 8001 --latency 0.5
+
+The client used by the scripts is configured with environment variables:
+    DBPEDIA_SPARQL_URL     url of the endpoint, e.g. a local one at http://localhost:8001/sparql
+    DBPEDIA_FIXTURES       answer from this fixtures file, without any requests or cache
+    DBPEDIA_CACHE          path of the cache, default metadata/dbpedia_cache.db
+    DBPEDIA_WORKERS        # queries in flight, default 4
+    DBPEDIA_RATE           max # queries per second, default 2
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from wikidata_api import RETRY_STATUS, RateLimiter, ThreadingHTTPServer, retry_after
+
+DBPEDIA_URL = "https://dbpedia.org/sparql"
+DBPEDIA_PARAMS = {
+    "default-graph-uri": "http://dbpedia.org",
+    "format": "application/sparql-results+json",
+    "timeout": "60000",
+    "signal_void": "on",
+    "signal_unconnected": "on",
+}
+
+# The result bindings of a query, one dict per row.
+Bindings = List[Dict[str, Dict[str, str]]]
+
+
+def query_key(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+class QueryCache:
+    """The results of the queries completed so far, in SQLite."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(str(path), check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS queries (key TEXT PRIMARY KEY, query TEXT, bindings TEXT)"
+        )
+
+    def get(self, query: str) -> Optional[Bindings]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT bindings FROM queries WHERE key = ?", (query_key(query),)
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, query: str, bindings: Bindings) -> None:
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO queries VALUES (?, ?, ?)",
+                (query_key(query), query, json.dumps(bindings)),
+            )
+
+    def items(self) -> Iterator[Dict]:
+        for query, bindings in self.connection.execute("SELECT query, bindings FROM queries"):
+            yield {"query": query, "bindings": json.loads(bindings)}
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def read_fixtures(path: Path) -> Dict[str, Bindings]:
+    with open(path, "r", encoding="utf-8") as f:
+        fixtures = (json.loads(line) for line in f if line.strip())
+        return {query_key(fixture["query"]): fixture["bindings"] for fixture in fixtures}
+
+
+class SparqlClient:
+    def __init__(self, url: str = DBPEDIA_URL, cache: Optional[Path] = None, fixtures: Optional[Path] = None,
+            workers: int = 4, rate: float = 2.0, retries: int = 5, backoff: float = 2.0, timeout: float = 120.0):
+        self.url = url
+        # With fixtures no requests are made, so there is nothing to cache.
+        self.cache = QueryCache(cache) if cache is not None and fixtures is None else None
+        self.fixtures = read_fixtures(fixtures) if fixtures is not None else None
+        self.workers = workers
+        self.limiter = RateLimiter(rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def query(self, query: str) -> Bindings:
+        if self.fixtures is not None:
+            bindings = self.fixtures.get(query_key(query))
+            if bindings is None:
+                raise KeyError(f"No fixture for query: {query[:200]}")
+            return bindings
+
+        bindings = self.cache.get(query) if self.cache is not None else None
+        if bindings is None:
+            bindings = self.fetch(query)
+            if self.cache is not None:
+                self.cache.put(query, bindings)
+        return bindings
+
+    def query_many(self, queries: List[str]) -> List[Bindings]:
+        """Run the queries concurrently, the results are in the order of the queries."""
+        done = 0
+        lock = threading.Lock()
+
+        def run(query: str) -> Bindings:
+            nonlocal done
+            bindings = self.query(query)
+            with lock:
+                done += 1
+                if done % 10 == 0 or done == len(queries):
+                    print(f"Queried {done} out of {len(queries)} queries.")
+            return bindings
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(run, queries))
+
+    def fetch(self, query: str) -> Bindings:
+        """Run a single query on the endpoint, with retries."""
+        params = dict(DBPEDIA_PARAMS, query=query)
+        for attempt in range(self.retries + 1):
+            self.limiter.wait()
+            try:
+                r = self.session.get(self.url, params=params, timeout=self.timeout)
+                if r.status_code not in RETRY_STATUS:
+                    r.raise_for_status()
+                    # An overloaded endpoint may answer with an error page instead of results.
+                    try:
+                        return r.json()["results"]["bindings"]
+                    except (ValueError, KeyError, TypeError):
+                        error = f"the response is not a SPARQL result: {r.text[:200]!r}"
+                else:
+                    error = f"HTTP {r.status_code}"
+                delay = retry_after(r.headers.get("Retry-After"), self.backoff * 2 ** attempt)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = str(e)
+                delay = self.backoff * 2 ** attempt
+            if attempt == self.retries:
+                break
+            time.sleep(delay)
+        raise RuntimeError(f"Failed to run query after {self.retries} retries ({error}): {query[:200]}")
+
+
+_client: Optional[SparqlClient] = None
+
+
+def get_client() -> SparqlClient:
+    """The client shared by the scripts, configured by the environment."""
+    global _client
+    if _client is None:
+        fixtures = os.environ.get("DBPEDIA_FIXTURES")
+        _client = SparqlClient(
+            url=os.environ.get("DBPEDIA_SPARQL_URL", DBPEDIA_URL),
+            cache=Path(os.environ.get("DBPEDIA_CACHE", os.path.join("metadata", "dbpedia_cache.db"))),
+            fixtures=Path(fixtures) if fixtures else None,
+            workers=int(os.environ.get("DBPEDIA_WORKERS", 4)),
+            rate=float(os.environ.get("DBPEDIA_RATE", 2)),
+        )
+    return _client
+
+
+def serve(fixtures: Path, port: int, latency: float) -> None:
+    """Answer queries from a fixtures file, after `latency` seconds."""
+    results = read_fixtures(fixtures)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query).get("query", [""])[0]
+            time.sleep(latency)
+            bindings = results.get(query_key(query))
+            if bindings is None:
+                self.send_error(400, "Unknown query")
+                return
+            body = json.dumps({"results": {"bindings": bindings}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/sparql-results+json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    print(f"Serving {len(results)} queries on http://localhost:{port}/sparql")
+    ThreadingHTTPServer(("", port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tools for offline use of the SPARQL client")
+    commands = parser.add_subparsers(dest="command")
+    export = commands.add_parser("export", help="Write the queries in a cache as fixtures")
+    export.add_argument("cache", type=Path)
+    export.add_argument("fixtures", type=Path)
+    server = commands.add_parser("serve", help="Serve fixtures as a stand-in for the endpoint")
+    server.add_argument("fixtures", type=Path)
+    server.add_argument("--port", type=int, default=8001)
+    server.add_argument("--latency", type=float, default=0.0, help="Seconds before every response")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        cache = QueryCache(args.cache)
+        with open(args.fixtures, "w", encoding="utf-8") as f:
+            for fixture in cache.items():
+                f.write(json.dumps(fixture) + "\n")
+        cache.close()
+    elif args.command == "serve":
+        serve(args.fixtures, args.port, args.latency)
+    else:
+        parser.print_help()
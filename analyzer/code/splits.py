@@ -0,0 +1,101 @@
+"""
+Train/test splits of a triples file, persisted so every script uses the same one.
+run_ampli.py computes the split once and saves the rows of the train and test
+triples in 'splits/{hash}-seed{seed}-test{size}.npz' next to the triples file,
+keyed by the content hash of the file, the seed and the test size. analyze.py
+then loads that split instead of computing it again, so the two can not drift
+apart when the split algorithm of ampligraph changes.
+
+Besides ampligraph's `train_test_split_no_unseen`, the split can be computed
+with `native_split_no_unseen`, the same algorithm on integer codes, which is
+much faster for large graphs.
+"""
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+from triple_store import EncodedTriples
+
+SEED = 23891367
+TEST_SIZE = 0.2
+METHODS = ["ampligraph", "native"]
+
+
+def split_path(folder: Path, sha256: str, seed: int, test_size: float) -> Path:
+    return folder.joinpath("splits", f"{sha256[:16]}-seed{seed}-test{test_size}.npz")
+
+
+def n_test(store: EncodedTriples, test_size: float) -> int:
+    return int(len(store) * test_size) if isinstance(test_size, float) else test_size
+
+
+def native_split_no_unseen(store: EncodedTriples, test_size: float, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """The rows of the train and test triples. Triples are drawn in a random order,
+    and put in the test set as long as their entities and relation keep occurring
+    in the train set, like `train_test_split_no_unseen` with the same seed."""
+    size = n_test(store, test_size)
+    entity_counts = np.bincount(np.concatenate([store.s, store.o]), minlength=len(store.entities)).tolist()
+    relation_counts = np.bincount(store.p, minlength=len(store.relations)).tolist()
+
+    order = np.random.RandomState(seed).permutation(len(store))
+    subjects, predicates, objects = store.s[order].tolist(), store.p[order].tolist(), store.o[order].tolist()
+    test, train = [], []
+    for i in range(len(order)):
+        s, p, o = subjects[i], predicates[i], objects[i]
+        entity_counts[s] -= 1
+        relation_counts[p] -= 1
+        entity_counts[o] -= 1
+        if entity_counts[s] > 0 and relation_counts[p] > 0 and entity_counts[o] > 0:
+            test.append(i)
+            if len(test) == size:
+                train.extend(range(i + 1, len(order)))
+                break
+        else:
+            entity_counts[s] += 1
+            relation_counts[p] += 1
+            entity_counts[o] += 1
+            train.append(i)
+
+    if len(test) != size:
+        raise ValueError(f"Could not find a test set of {size} triples without unseen entities, only {len(test)}.")
+    return order[train], order[test]
+
+
+def rows_of(store: EncodedTriples, labels: np.ndarray) -> np.ndarray:
+    """The rows of the store holding the (n, 3) triple labels."""
+    n_entities, n_relations = len(store.entities), len(store.relations)
+    keys = lambda s, p, o: (s.astype(np.int64) * n_relations + p) * n_entities + o
+    store_keys = keys(store.s, store.p, store.o)
+    order = np.argsort(store_keys)
+    wanted = keys(store.entity_index.get_indexer(labels[:, 0]), store.relation_index.get_indexer(labels[:, 1]),
+        store.entity_index.get_indexer(labels[:, 2]))
+    return order[np.searchsorted(store_keys, wanted, sorter=order)]
+
+
+def ampligraph_split_no_unseen(store: EncodedTriples, test_size: float, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    from ampligraph.evaluation import train_test_split_no_unseen
+
+    train, test = train_test_split_no_unseen(store.labels(), test_size=test_size, seed=seed)
+    return rows_of(store, train), rows_of(store, test)
+
+
+def load_split(store: EncodedTriples, folder: Path, test_size: float = TEST_SIZE, seed: int = SEED,
+        method: str = "ampligraph") -> Tuple[np.ndarray, np.ndarray]:
+    """The train and test triples, from the saved split if there is one. Otherwise
+    the split is computed with `method` and saved."""
+    path = split_path(folder, store.sha256, seed, test_size)
+    if path.is_file():
+        with np.load(path) as split:
+            sha256, saved_method = str(split["sha256"]), str(split["method"])
+            train, test = split["train"], split["test"]
+        if sha256 == store.sha256:
+            print(f"Loaded the {saved_method} split from {path}.")
+            return store.labels(train), store.labels(test)
+
+    split_no_unseen = native_split_no_unseen if method == "native" else ampligraph_split_no_unseen
+    train, test = split_no_unseen(store, test_size, seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(path, train=train, test=test, sha256=store.sha256, seed=seed, test_size=test_size, method=method)
+    print(f"Saved the {method} split in {path}.")
+    return store.labels(train), store.labels(test)
@@ -0,0 +1,151 @@
+"""
+Integer-encoded access to a tab separated triples file (e.g. 'triples.txt'). The
+first time a file is loaded, it is converted into a cache folder next to it
+('triples.txt.cache'): the s, p and o of every triple as int32 arrays, the
+entity and relation vocabularies, and an index of the triples by predicate and
+by subject. After that, loading only memory-maps these arrays. The cache is
+rebuilt whenever the file changes.
+
+Like ampligraph's `load_from_csv`, duplicate triples are dropped, keeping the
+order of their first occurrence.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Bump to rebuild caches written by an older version.
+CACHE_VERSION = 1
+
+
+def cache_path(path: Path) -> Path:
+    return path.with_name(path.name + ".cache")
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(2 ** 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_stamp(path: Path) -> Dict:
+    stat = os.stat(path)
+    return {"version": CACHE_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def write_vocabulary(path: Path, labels: np.ndarray) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for label in labels:
+            f.write(label + "\n")
+
+
+def read_vocabulary(path: Path) -> np.ndarray:
+    with open(path, "r", encoding="utf-8") as f:
+        return np.array(f.read().split("\n")[:-1], dtype=object)
+
+
+def build_index(codes: np.ndarray, count: int, target: Path, name: str) -> None:
+    """The rows sorted by code (and by row within a code), with the offset of every code."""
+    np.save(target.joinpath(f"by_{name}.npy"), np.argsort(codes, kind="stable").astype(np.int64))
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=count))])
+    np.save(target.joinpath(f"{name}_offsets.npy"), offsets.astype(np.int64))
+
+
+def build_cache(path: Path, target: Path) -> None:
+    triples = pd.read_csv(path, sep="\t", header=None, names=["s", "p", "o"], dtype=str, keep_default_na=False)
+    triples = triples.drop_duplicates(ignore_index=True)
+
+    entity_codes, entities = pd.factorize(np.concatenate([triples.s.values, triples.o.values]))
+    relation_codes, relations = pd.factorize(triples.p.values)
+    s, o = np.split(entity_codes.astype(np.int32), 2)
+    p = relation_codes.astype(np.int32)
+
+    target.mkdir(parents=True, exist_ok=True)
+    for name, column in [("s", s), ("p", p), ("o", o)]:
+        np.save(target.joinpath(f"{name}.npy"), column)
+    write_vocabulary(target.joinpath("entities.txt"), np.asarray(entities))
+    write_vocabulary(target.joinpath("relations.txt"), np.asarray(relations))
+    build_index(p, len(relations), target, "predicate")
+    build_index(s, len(entities), target, "subject")
+
+    # Written last, a cache without it is incomplete.
+    meta = dict(source_stamp(path), sha256=file_hash(path), triples=len(p))
+    with open(target.joinpath("meta.json"), "w") as f:
+        json.dump(meta, f)
+
+
+class EncodedTriples:
+    def __init__(self, folder: Path):
+        with open(folder.joinpath("meta.json"), "r") as f:
+            self.meta = json.load(f)
+        load = lambda name: np.asarray(np.load(folder.joinpath(f"{name}.npy"), mmap_mode="r"))
+        self.s, self.p, self.o = load("s"), load("p"), load("o")
+        self.by_predicate, self.predicate_offsets = load("by_predicate"), load("predicate_offsets")
+        self.by_subject, self.subject_offsets = load("by_subject"), load("subject_offsets")
+        self.entities = read_vocabulary(folder.joinpath("entities.txt"))
+        self.relations = read_vocabulary(folder.joinpath("relations.txt"))
+        self.entity_index = pd.Index(self.entities)
+        self.relation_index = pd.Index(self.relations)
+
+    @property
+    def sha256(self) -> str:
+        """Hash of the content of the triples file."""
+        return self.meta["sha256"]
+
+    def __len__(self) -> int:
+        return len(self.p)
+
+    def entity_code(self, label: str) -> Optional[int]:
+        return self.entity_index.get_loc(label) if label in self.entity_index else None
+
+    def relation_code(self, label: str) -> Optional[int]:
+        return self.relation_index.get_loc(label) if label in self.relation_index else None
+
+    def with_predicate(self, label: str) -> np.ndarray:
+        """The rows of the triples with this predicate, in file order."""
+        code = self.relation_code(label)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        return self.by_predicate[self.predicate_offsets[code] : self.predicate_offsets[code + 1]]
+
+    def with_subject(self, label: str) -> np.ndarray:
+        """The rows of the triples with this subject, in file order."""
+        code = self.entity_code(label)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        return self.by_subject[self.subject_offsets[code] : self.subject_offsets[code + 1]]
+
+    def predicate_counts(self) -> pd.Series:
+        return pd.Series(np.diff(self.predicate_offsets), index=self.relations)
+
+    def labels(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """The (n, 3) array of labels of the triples (or of some rows), as returned
+        by `load_from_csv`."""
+        rows = slice(None) if rows is None else rows
+        return np.stack([self.entities[self.s[rows]], self.relations[self.p[rows]], self.entities[self.o[rows]]], axis=1)
+
+    def to_frame(self, rows: Optional[np.ndarray] = None) -> pd.DataFrame:
+        return pd.DataFrame(self.labels(rows), columns=["s", "p", "o"])
+
+
+def load_triples(path: Path) -> EncodedTriples:
+    """The store of a triples file, converting it first if needed."""
+    target = cache_path(path)
+    meta_path = target.joinpath("meta.json")
+    if meta_path.is_file():
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        if all(meta.get(key) == value for key, value in source_stamp(path).items()):
+            return EncodedTriples(target)
+
+    print(f"Converting {path} into {target}.")
+    if meta_path.is_file():
+        meta_path.unlink()
+    build_cache(path, target)
+    return EncodedTriples(target)
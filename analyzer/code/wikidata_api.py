@@ -0,0 +1,332 @@
+"""
+Client for the `wbgetentities` action of the Wikidata API, used to look up the
+claims of entities. Ids are queried 50 at a time (the API maximum), several
+requests are in flight at once over a pooled session, under a rate limit, and
+failed requests are retried with exponential backoff. Every response is stored
+in an on-disk cache keyed by entity id, so an entity is only fetched once, also
+across runs.
+
+For offline runs, the client can answer from a fixtures file (json lines, one
+entity with its `claims` per line) instead of the API. The same file can be
+served as a stand-in for the API, to benchmark the network path locally:
+
+    python3 wikidata_api.py export metadata/wikidata_cache.db fixtures.jsonl
+    python3 wikidata_api.py serve fixtures.jsonl --port 8000 --latency 0.2
+
+The client used by the scripts is configured with environment variables:
+    WIKIDATA_API_URL       url of the API, e.g. http://localhost:8000/w/api.php
+    WIKIDATA_FIXTURES      answer from this fixtures file, without any requests or cache
+    WIKIDATA_CACHE         path of the cache, default metadata/wikidata_cache.db
+    WIKIDATA_WORKERS       # requests in flight, default 8
+    WIKIDATA_RATE          max # requests per second, default 10
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+API_URL = "https://www.wikidata.org/w/api.php"
+# Maximum # ids in a single wbgetentities request.
+MAX_IDS = 50
+# Responses which are worth retrying.
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# An entity as returned by the API, None if it does not exist.
+Entity = Optional[Dict]
+
+
+class RateLimiter:
+    """Spaces out calls to `wait` to at most `rate` per second, over all threads."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next = time.monotonic()
+
+    def wait(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next)
+            self.next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class ResponseCache:
+    """The entities fetched so far, in SQLite. Entities that do not exist are
+    stored as well, so they are not queried again."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(str(path), check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS entities (id TEXT PRIMARY KEY, data TEXT)"
+        )
+
+    def get_many(self, entity_ids: List[str]) -> Dict[str, Entity]:
+        result: Dict[str, Entity] = {}
+        with self.lock:
+            for i in range(0, len(entity_ids), 900):
+                chunk = entity_ids[i : i + 900]
+                query = f"SELECT id, data FROM entities WHERE id IN ({','.join('?' * len(chunk))})"
+                for entity_id, data in self.connection.execute(query, chunk):
+                    result[entity_id] = json.loads(data) if data is not None else None
+        return result
+
+    def put_many(self, entities: Dict[str, Entity]) -> None:
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO entities VALUES (?, ?)",
+                (
+                    (entity_id, json.dumps(entity) if entity is not None else None)
+                    for entity_id, entity in entities.items()
+                ),
+            )
+
+    def items(self) -> Iterator[Entity]:
+        for (data,) in self.connection.execute(
+            "SELECT data FROM entities WHERE data IS NOT NULL"
+        ):
+            yield json.loads(data)
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def retry_after(value: Optional[str], default: float) -> float:
+    """Seconds to wait by a Retry-After header, which holds either seconds or an
+    HTTP-date. Without a (valid) header, `default`."""
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+def read_fixtures(path: Path) -> Dict[str, Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        entities = (json.loads(line) for line in f if line.strip())
+        return {entity["id"]: entity for entity in entities}
+
+
+class WikidataClient:
+    def __init__(
+        self,
+        url: str = API_URL,
+        cache: Optional[Path] = None,
+        fixtures: Optional[Path] = None,
+        workers: int = 8,
+        rate: float = 10.0,
+        retries: int = 5,
+        backoff: float = 1.0,
+        timeout: float = 60.0,
+    ):
+        self.url = url
+        # With fixtures no requests are made, so there is nothing to cache.
+        self.fixtures = read_fixtures(fixtures) if fixtures is not None else None
+        self.cache = (
+            ResponseCache(cache) if cache is not None and fixtures is None else None
+        )
+        self.workers = workers
+        self.limiter = RateLimiter(rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = (
+            "KGE-bias-analyzer (https://github.com/wradstok/KGE-bias-analyzer)"
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get_entities(self, entity_ids: Iterable[str]) -> Dict[str, Dict]:
+        """The entities (with their claims) by id, leaving out those which do not exist."""
+        entity_ids = list(dict.fromkeys(entity_ids))
+        if self.fixtures is not None:
+            return {
+                entity_id: self.fixtures[entity_id]
+                for entity_id in entity_ids
+                if entity_id in self.fixtures
+            }
+
+        entities = self.cache.get_many(entity_ids) if self.cache is not None else {}
+        missing = [entity_id for entity_id in entity_ids if entity_id not in entities]
+        batches = [missing[i : i + MAX_IDS] for i in range(0, len(missing), MAX_IDS)]
+        if len(batches) > 0:
+            print(
+                f"Fetching {len(missing)} of {len(entity_ids)} entities from Wikidata, {len(entity_ids) - len(missing)} are cached."
+            )
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.fetch, batch) for batch in batches]
+            for done, future in enumerate(as_completed(futures), 1):
+                fetched = future.result()
+                if self.cache is not None:
+                    self.cache.put_many(fetched)
+                entities.update(fetched)
+                if done % 20 == 0 or done == len(futures):
+                    print(f"Queried {done} out of {len(futures)} batches.")
+
+        return {
+            entity_id: entities[entity_id]
+            for entity_id in entity_ids
+            if entities.get(entity_id) is not None
+        }
+
+    def fetch(self, entity_ids: List[str]) -> Dict[str, Entity]:
+        """Fetch a single batch of entities from the API, with retries."""
+        params = {
+            "action": "wbgetentities",
+            "ids": "|".join(entity_ids),
+            "props": "claims",
+            "redirects": "yes",
+            "format": "json",
+        }
+        for attempt in range(self.retries + 1):
+            self.limiter.wait()
+            try:
+                r = self.session.get(self.url, params=params, timeout=self.timeout)
+                if r.status_code not in RETRY_STATUS:
+                    r.raise_for_status()
+                    r_data = r.json()
+                    if "error" not in r_data:
+                        break
+                    error = r_data["error"].get("code")
+                    if error != "maxlag":
+                        raise RuntimeError(f"Wikidata API error: {r_data['error']}")
+                delay = retry_after(
+                    r.headers.get("Retry-After"), self.backoff * 2**attempt
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                delay = self.backoff * 2**attempt
+            if attempt == self.retries:
+                raise RuntimeError(
+                    f"Failed to fetch {len(entity_ids)} entities after {self.retries} retries"
+                )
+            time.sleep(delay)
+
+        # Entities which do not exist (anymore) are marked as 'missing'. Entities that were
+        # merged into another are answered with the target, which is stored under the requested id.
+        entities: Dict[str, Entity] = {entity_id: None for entity_id in entity_ids}
+        for entity_id, entity in r_data.get("entities", {}).items():
+            if "missing" not in entity:
+                requested = entity.get("redirects", {}).get("from", entity_id)
+                entities[requested] = {
+                    "id": requested,
+                    "claims": entity.get("claims", {}),
+                }
+        return entities
+
+
+_client: Optional[WikidataClient] = None
+
+
+def get_client() -> WikidataClient:
+    """The client shared by the scripts, configured by the environment."""
+    global _client
+    if _client is None:
+        fixtures = os.environ.get("WIKIDATA_FIXTURES")
+        _client = WikidataClient(
+            url=os.environ.get("WIKIDATA_API_URL", API_URL),
+            cache=Path(
+                os.environ.get(
+                    "WIKIDATA_CACHE", os.path.join("metadata", "wikidata_cache.db")
+                )
+            ),
+            fixtures=Path(fixtures) if fixtures else None,
+            workers=int(os.environ.get("WIKIDATA_WORKERS", 8)),
+            rate=float(os.environ.get("WIKIDATA_RATE", 10)),
+        )
+    return _client
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def serve(fixtures: Path, port: int, latency: float) -> None:
+    """Answer wbgetentities requests from a fixtures file, after `latency` seconds."""
+    entities = read_fixtures(fixtures)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            ids = parse_qs(urlparse(self.path).query).get("ids", [""])[0].split("|")
+            time.sleep(latency)
+            body = json.dumps(
+                {
+                    "entities": {
+                        entity_id: entities.get(
+                            entity_id, {"id": entity_id, "missing": ""}
+                        )
+                        for entity_id in ids
+                    }
+                }
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    print(f"Serving {len(entities)} entities on http://localhost:{port}/w/api.php")
+    ThreadingHTTPServer(("", port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Tools for offline use of the Wikidata API client"
+    )
+    commands = parser.add_subparsers(dest="command")
+    export = commands.add_parser(
+        "export", help="Write the entities in a cache as fixtures"
+    )
+    export.add_argument("cache", type=Path)
+    export.add_argument("fixtures", type=Path)
+    server = commands.add_parser(
+        "serve", help="Serve fixtures as a stand-in for the API"
+    )
+    server.add_argument("fixtures", type=Path)
+    server.add_argument("--port", type=int, default=8000)
+    server.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds before every response"
+    )
+    args = parser.parse_args()
+
+    if args.command == "export":
+        cache = ResponseCache(args.cache)
+        with open(args.fixtures, "w", encoding="utf-8") as f:
+            for entity in cache.items():
+                f.write(json.dumps(entity) + "\n")
+        cache.close()
+    elif args.command == "serve":
+        serve(args.fixtures, args.port, args.latency)
+    else:
+        parser.print_help()
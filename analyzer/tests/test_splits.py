@@ -0,0 +1,60 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from splits import load_split, native_split_no_unseen, split_path
+from triple_store import EncodedTriples, load_triples
+
+SEED = 1234
+
+
+@pytest.fixture
+def triples(tmp_path: Path) -> EncodedTriples:
+    random_state = np.random.RandomState(0)
+    rows = zip(
+        random_state.randint(0, 40, 500),
+        random_state.randint(0, 6, 500),
+        random_state.randint(0, 40, 500),
+    )
+    path = tmp_path.joinpath("triples.txt")
+    with open(path, "w") as f:
+        for s, p, o in dict.fromkeys(rows):
+            f.write(f"Q{s}\tP{p}\tQ{o}\n")
+    return load_triples(path)
+
+
+def test_native_split_has_no_unseen(triples: EncodedTriples):
+    train, test = native_split_no_unseen(triples, 0.2, SEED)
+    assert len(test) == int(len(triples) * 0.2)
+    assert sorted(np.concatenate([train, test]).tolist()) == list(range(len(triples)))
+    for codes in (triples.s, triples.o):
+        assert set(codes[test]) <= set(triples.s[train]) | set(triples.o[train])
+    assert set(triples.p[test]) <= set(triples.p[train])
+
+    again_train, again_test = native_split_no_unseen(triples, 0.2, SEED)
+    assert (again_train == train).all() and (again_test == test).all()
+
+
+def test_native_split_equals_ampligraph(triples: EncodedTriples):
+    evaluation = pytest.importorskip("ampligraph.evaluation")
+    expected_train, expected_test = evaluation.train_test_split_no_unseen(
+        triples.labels(), test_size=0.2, seed=SEED
+    )
+    train, test = native_split_no_unseen(triples, 0.2, SEED)
+    assert (triples.labels(train) == expected_train).all()
+    assert (triples.labels(test) == expected_test).all()
+
+
+def test_load_split_round_trip(triples: EncodedTriples, tmp_path: Path):
+    train, test = load_split(triples, tmp_path, seed=SEED, method="native")
+    assert split_path(tmp_path, triples.sha256, SEED, 0.2).is_file()
+
+    loaded_train, loaded_test = load_split(
+        triples, tmp_path, seed=SEED, method="native"
+    )
+    assert (loaded_train == train).all() and (loaded_test == test).all()
+    native_train, native_test = native_split_no_unseen(triples, 0.2, SEED)
+    assert (triples.labels(native_train) == train).all() and (
+        triples.labels(native_test) == test
+    ).all()
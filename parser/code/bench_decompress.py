@@ -0,0 +1,43 @@
+"""
+Measure how fast the dump can be read with every available decompression
+method, in MB/s of decompressed lines and of the compressed file. Variants of
+the same dump ('.gz', an indexed '.gz', '.bz2', '.zst') can be compared by
+passing all of them.
+
+    python3 bench_decompress.py ../data/latest-all.json.gz ../data/latest-indexed.json.gz --entities 1000000
+"""
+import argparse
+import itertools
+import pathlib
+import time
+from typing import Tuple
+
+from decompress import available_methods
+from dumpindex import open_dump, read_index
+from helper import iter_lines
+
+def measure(dump: pathlib.Path, method: str, entities: int, threads: int) -> Tuple[int, int, float]:
+    """ Returns # entities read, # decompressed bytes and the seconds it took. """
+    start = time.perf_counter()
+    count, size = 0, 0
+    with open_dump(dump, 0, method, threads) as f:
+        for line in itertools.islice(iter_lines(f), entities):
+            count += 1
+            size += len(line)
+    return count, size, time.perf_counter() - start
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Decompression speed of the dump")
+    parser.add_argument("dumps", type=pathlib.Path, nargs="+", help="Paths of the (variants of the) Wikidata JSON dump")
+    parser.add_argument("--entities", dest="entities", type=int, help="# entities read from every dump, all of them by default", default=None)
+    parser.add_argument("--threads", dest="threads", type=int, help="# threads of the 'threads' method", default=4)
+    args = parser.parse_args()
+
+    print(f"{'dump':<30}{'method':<10}{'entities':>12}{'seconds':>10}{'MB/s':>10}{'MB/s in':>10}")
+    for dump in args.dumps:
+        compressed = dump.stat().st_size
+        for method in available_methods(dump, read_index(dump)):
+            count, size, seconds = measure(dump, method, args.entities, args.threads)
+            # The rate of the compressed input is only known when the whole file was read.
+            rate_in = f"{compressed / 2**20 / seconds:.1f}" if args.entities is None else "-"
+            print(f"{dump.name:<30}{method:<10}{count:>12,}{seconds:>10.2f}{size / 2**20 / seconds:>10.1f}{rate_in:>10}")
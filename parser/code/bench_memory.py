@@ -0,0 +1,48 @@
+"""
+Measure how much memory the entities of every parser take while they are held
+in `DataMgr.entities` between dumps, and how large they are once pickled.
+
+    python3 bench_memory.py --dump ../data/latest-all.json.gz --entities 100000
+"""
+import argparse
+import gc
+import itertools
+import pathlib
+import pickle
+from typing import List, Tuple
+
+from decoders import get_decoder
+from dumpindex import open_dump
+from entityparsers.entity import EntData, mean_size
+from entityparsers.manager import DataMgr
+from helper import iter_entities, iter_lines
+
+def measure(name: str, lines: List[bytes]) -> Tuple[int, float, float]:
+    """ Returns # entities kept, bytes in memory and pickled bytes per entity. """
+    data = DataMgr()
+    data.set_parser(name)
+    decode = get_decoder()
+
+    entities : List[EntData] = list(filter(None, map(data.process_entity, iter_entities(filter(data.accept_line, lines), decode))))
+    if len(entities) == 0:
+        return 0, 0.0, 0.0
+
+    gc.collect()
+    pickled = len(pickle.dumps({entity.id: entity for entity in entities}))
+    return len(entities), mean_size(entities), pickled / len(entities)
+
+if __name__ == '__main__':
+    source = pathlib.Path(__file__).resolve().parent.parent.absolute()
+
+    parser = argparse.ArgumentParser(description="Memory use per entity of the parsers")
+    parser.add_argument("--dump", dest="dump", type=pathlib.Path, help="Path of the Wikidata JSON dump", default=source.joinpath("data", "latest-all.json.gz"))
+    parser.add_argument("--entities", dest="entities", type=int, help="# entities read from the dump", default=100_000)
+    args = parser.parse_args()
+
+    with open_dump(args.dump) as f:
+        lines = list(itertools.islice(iter_lines(f), args.entities))
+
+    print(f"{'parser':<12}{'entities':>10}{'bytes/entity':>15}{'pickled/entity':>17}")
+    for name in DataMgr().get_parsers():
+        count, in_memory, pickled = measure(name, lines)
+        print(f"{name:<12}{count:>10,}{in_memory:>15,.0f}{pickled:>17,.0f}")
@@ -0,0 +1,97 @@
+"""
+End-to-end benchmark of the parsers. Every parser runs as a separate
+`wikidata_parser.py` process over the same dump (e.g. one made with
+synthdump.py), in a scratch directory. We report the entities and MB of
+decompressed json per second, the peak memory of the run (the largest process,
+including the workers) and the size of the output. With --results the numbers
+are appended as json lines, to track them over time.
+
+    python3 synthdump.py ../data/synthetic-all.json.gz --entities 100000
+    python3 bench_parsers.py --dump ../data/synthetic-all.json.gz --workers 4 --results bench.jsonl
+"""
+import argparse
+import json
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+from dumpindex import open_dump
+from entityparsers.manager import DataMgr
+from helper import iter_lines
+from metrics import resource
+
+PARSER_SCRIPT = pathlib.Path(__file__).resolve().parent.joinpath("wikidata_parser.py")
+
+# Runs the parser as its only child and prints the peak memory of its children, which
+# is that of the parser or of its largest worker (in kB on Linux). The peak of all
+# children of this process would include the parsers that ran before.
+MEASURE = """
+import resource, subprocess, sys
+status = subprocess.call(sys.argv[1:], stdout=subprocess.DEVNULL)
+print(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+sys.exit(status)
+"""
+
+def dump_size(dump: pathlib.Path) -> Tuple[int, int]:
+    """ # entities and # bytes of decompressed entity lines in the dump. """
+    count, size = 0, 0
+    with open_dump(dump) as f:
+        for line in iter_lines(f):
+            count += 1
+            size += len(line)
+    return count, size
+
+def output_size(path: pathlib.Path) -> int:
+    """ Size of all files in the directory, recursively. """
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+def run_parser(parser: str, dump: pathlib.Path, options: List[str]) -> Dict:
+    """ Run a parser in a scratch directory, returns the seconds it took, its
+        peak memory in MB (None where the resource module does not exist, e.g.
+        on Windows) and the size of its output in MB. """
+    command = [sys.executable, str(PARSER_SCRIPT), parser, "--dump", str(dump.resolve()), *options]
+    with tempfile.TemporaryDirectory(prefix=f"bench-{parser}-") as scratch:
+        start = time.perf_counter()
+        if resource is not None:
+            proc = subprocess.run([sys.executable, "-c", MEASURE, *command], cwd=scratch, stdout=subprocess.PIPE)
+            peak : Optional[float] = int(proc.stdout.split()[-1]) / 2**10 if proc.returncode == 0 else None
+        else:
+            proc = subprocess.run(command, cwd=scratch, stdout=subprocess.DEVNULL)
+            peak = None
+        seconds = time.perf_counter() - start
+        if proc.returncode != 0:
+            raise RuntimeError(f"parser '{parser}' failed with status {proc.returncode}")
+
+        # Only count the output, not the checkpoint.
+        output = sum(output_size(path) if path.is_dir() else path.stat().st_size
+            for path in pathlib.Path(scratch).iterdir() if path.suffix != ".ckpt")
+    return {"seconds": seconds, "peak_rss_mb": peak, "output_mb": output / 2**20}
+
+if __name__ == '__main__':
+    source = pathlib.Path(__file__).resolve().parent.parent.absolute()
+
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the parsers")
+    parser.add_argument("--dump", dest="dump", type=pathlib.Path, help="Path of the (synthetic) dump", default=source.joinpath("data", "synthetic-all.json.gz"))
+    parser.add_argument("--parsers", dest="parsers", type=str, nargs="+", choices=DataMgr().get_parsers(), help="Parsers to run, all of them by default", default=None)
+    parser.add_argument("--results", dest="results", type=pathlib.Path, help="Append the results to this json lines file", default=None)
+    parser.add_argument("--label", dest="label", type=str, help="Label of the results, e.g. the commit", default="")
+    args, options = parser.parse_known_args()
+    # Unknown options (e.g. --workers 4 --format columnar) are passed on to wikidata_parser.py.
+
+    entities, size = dump_size(args.dump)
+    print(f"{args.dump.name}: {entities:,} entities, {size / 2**20:,.1f} MB of json")
+    print(f"{'parser':<12}{'seconds':>10}{'entities/s':>12}{'MB/s':>8}{'peak MB':>10}{'output MB':>11}")
+
+    for name in args.parsers or DataMgr().get_parsers():
+        result = run_parser(name, args.dump, options)
+        result.update({"parser": name, "dump": args.dump.name, "entities": entities, "options": " ".join(options),
+            "label": args.label, "entities_per_s": entities / result["seconds"], "mb_per_s": size / 2**20 / result["seconds"]})
+        print(f"{name:<12}{result['seconds']:>10.2f}{result['entities_per_s']:>12,.0f}{result['mb_per_s']:>8.1f}"
+            f"{result['peak_rss_mb'] or float('nan'):>10.1f}{result['output_mb']:>11.2f}")
+
+        if args.results is not None:
+            with open(args.results, "a") as f:
+                f.write(json.dumps(result) + "\n")
@@ -0,0 +1,79 @@
+"""
+Json decoding of the dump lines is the largest cost of a parser run. The stdlib
+decoder is always available, faster third party decoders are used when they are
+installed. A decoder takes a raw line from the dump, including the trailing ",\n".
+"""
+import importlib
+import json
+from typing import Callable, Dict, List
+
+Decoder = Callable[[bytes], Dict]
+
+# In order of preference for 'auto'.
+BACKENDS = ["orjson", "simdjson", "ujson", "json"]
+
+def content_end(line: bytes) -> int:
+    """ Index of the end of the json object, i.e. without the trailing ",\\n". """
+    end = len(line)
+    while end > 0 and line[end - 1] in b",\r\n":
+        end -= 1
+    return end
+
+def stdlib_decoder(from_bytes: bool) -> Decoder:
+    if from_bytes:
+        return lambda line: json.loads(line[:content_end(line)])
+
+    # raw_decode stops at the end of the object, so the trailing comma need not be sliced off.
+    raw_decode = json.JSONDecoder().raw_decode
+    return lambda line: raw_decode(line.decode('utf-8'))[0]
+
+def orjson_decoder(from_bytes: bool) -> Decoder:
+    import orjson
+    if from_bytes:
+        # orjson reads from a memoryview, so slicing does not copy the line.
+        return lambda line: orjson.loads(memoryview(line)[:content_end(line)])
+    return lambda line: orjson.loads(line.decode('utf-8').rstrip(',\r\n'))
+
+def simdjson_decoder(from_bytes: bool) -> Decoder:
+    import simdjson
+    if from_bytes:
+        return lambda line: simdjson.loads(line[:content_end(line)])
+    return lambda line: simdjson.loads(line.decode('utf-8').rstrip(',\r\n'))
+
+def ujson_decoder(from_bytes: bool) -> Decoder:
+    import ujson
+    if from_bytes:
+        return lambda line: ujson.loads(line[:content_end(line)])
+    return lambda line: ujson.loads(line.decode('utf-8').rstrip(',\r\n'))
+
+DECODERS = {
+    "json": stdlib_decoder,
+    "orjson": orjson_decoder,
+    "simdjson": simdjson_decoder,
+    "ujson": ujson_decoder,
+}
+
+def is_available(backend: str) -> bool:
+    if backend == "json":
+        return True
+    try:
+        importlib.import_module(backend)
+        return True
+    except ImportError:
+        return False
+
+def available_backends() -> List[str]:
+    return [backend for backend in BACKENDS if is_available(backend)]
+
+def resolve_backend(backend: str) -> str:
+    """ Map 'auto' to the fastest installed backend. """
+    if backend == "auto":
+        return available_backends()[0]
+    if not is_available(backend):
+        raise ValueError(f"json backend '{backend}' is not installed")
+    return backend
+
+def get_decoder(backend: str = "auto", from_bytes: bool = True) -> Decoder:
+    """ Get a decoder for dump lines. With `from_bytes` the raw line is passed
+        to the backend directly, otherwise it is first decoded to a str. """
+    return DECODERS[resolve_backend(backend)](from_bytes)
@@ -0,0 +1,141 @@
+"""
+Decompression of the dump. After the json decoding, decompressing the dump on a
+single core is the next limit on the throughput of a run. Besides the gzip module
+the dump can be decompressed by an external tool, which runs in its own process
+(and for pigz/igzip/lbzip2 on more cores), or, for a dump that was re-encoded into
+members by dumpindex.py, by a pool of threads that each decompress whole members.
+
+Dumps may be compressed with gzip ('.gz'), bzip2 ('.bz2') or zstandard ('.zst').
+A method yields an iterable of the decompressed lines of the dump.
+"""
+import bz2
+import gzip
+import io
+import shutil
+import subprocess
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Tuple
+
+# Ordinal of the first entity in a member, offset of that member in the compressed file.
+Point = Tuple[int, int]
+
+COMPRESSIONS = {".gz": "gz", ".bz2": "bz2", ".zst": "zst"}
+
+# External tools by compression, in order of preference for 'auto'. The single
+# core tools only take the decompression off the process that reads the lines,
+# which does not make up for the pipe, so 'auto' prefers the gzip module to them.
+TOOLS : Dict[str, List[str]] = {
+    "gz": ["igzip", "pigz", "gzip"],
+    "bz2": ["lbzip2", "pbzip2", "bzip2"],
+    "zst": ["zstd"],
+}
+SINGLE_CORE_TOOLS = ["gzip", "bzip2"]
+METHODS = ["threads", "python"] + [tool for tools in TOOLS.values() for tool in tools]
+
+# Pipe buffer of the external tools.
+PIPE_BUFFER = 2**20
+
+def compression(dump: Path) -> str:
+    if dump.suffix not in COMPRESSIONS:
+        raise ValueError(f"unknown compression of '{dump.name}', expected one of {', '.join(COMPRESSIONS)}")
+    return COMPRESSIONS[dump.suffix]
+
+def is_available(method: str, dump: Path, points: List[Point]) -> bool:
+    kind = compression(dump)
+    if method == "python":
+        if kind == "zst":
+            try:
+                import zstandard
+            except ImportError:
+                return False
+        return True
+    if method == "threads":
+        # The members are only known from the index.
+        return kind == "gz" and len(points) > 1
+    return method in TOOLS[kind] and shutil.which(method) is not None
+
+def available_methods(dump: Path, points: List[Point]) -> List[str]:
+    tools = TOOLS[compression(dump)]
+    candidates = ["threads"] + [tool for tool in tools if tool not in SINGLE_CORE_TOOLS] + ["python"] \
+        + [tool for tool in tools if tool in SINGLE_CORE_TOOLS]
+    return [method for method in candidates if is_available(method, dump, points)]
+
+def resolve_method(method: str, dump: Path, points: List[Point], threads: int) -> str:
+    """ Map 'auto' to the fastest available method for the dump. """
+    if method == "auto":
+        methods = available_methods(dump, points)
+        if threads <= 1 and "threads" in methods:
+            methods.remove("threads")
+        return methods[0]
+    if not is_available(method, dump, points):
+        if method == "threads":
+            raise ValueError("decompressing with 'threads' requires a gzip dump indexed by dumpindex.py")
+        raise ValueError(f"decompression method '{method}' is not available for '{dump.name}'")
+    return method
+
+@contextmanager
+def python_lines(raw: BinaryIO, kind: str) -> Iterator[Iterable[bytes]]:
+    if kind == "gz":
+        with gzip.GzipFile(fileobj=raw, mode="rb") as f:
+            yield f
+    elif kind == "bz2":
+        with bz2.BZ2File(raw, mode="rb") as f:
+            yield f
+    else:
+        import zstandard
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+        with io.BufferedReader(reader) as f:
+            yield f
+
+@contextmanager
+def tool_lines(raw: BinaryIO, tool: str) -> Iterator[Iterable[bytes]]:
+    """ Let an external tool decompress the file from its current position. """
+    proc = subprocess.Popen([tool, "-dc"], stdin=raw, stdout=subprocess.PIPE, bufsize=PIPE_BUFFER)
+    try:
+        yield proc.stdout
+    finally:
+        finished = proc.poll() is not None
+        if not finished:
+            proc.terminate()
+        proc.stdout.close()
+        proc.wait()
+    if finished and proc.returncode != 0:
+        raise IOError(f"{tool} failed with exit code {proc.returncode}")
+
+def iter_members(raw: BinaryIO, offsets: List[int], threads: int) -> Iterator[bytes]:
+    """ Decompress the gzip members starting at `offsets` with a pool of threads,
+        zlib releases the GIL while it inflates. The lines are yielded in file
+        order, with at most `threads` + 1 members in memory. """
+    raw.seek(0, io.SEEK_END)
+    ends = offsets[1:] + [raw.tell()]
+    with ThreadPoolExecutor(threads) as pool:
+        pending = deque()
+        for start, end in zip(offsets, ends):
+            raw.seek(start)
+            pending.append(pool.submit(zlib.decompress, raw.read(end - start), 16 + zlib.MAX_WBITS))
+            if len(pending) > threads:
+                yield from io.BytesIO(pending.popleft().result())
+        while len(pending) > 0:
+            yield from io.BytesIO(pending.popleft().result())
+
+@contextmanager
+def open_lines(dump: Path, method: str, points: List[Point], offset: int = 0, threads: int = 1) -> Iterator[Iterable[bytes]]:
+    """ Open the dump at the (member) `offset` and decompress it with the
+        resolved `method`. """
+    kind = compression(dump)
+    with open(dump, "rb") as raw:
+        # Without an offset the dump may also be a pipe, which can not seek.
+        if offset > 0:
+            raw.seek(offset)
+        if method == "python":
+            with python_lines(raw, kind) as f:
+                yield f
+        elif method == "threads":
+            yield iter_members(raw, [point for _, point in points if point >= offset], threads)
+        else:
+            with tool_lines(raw, method) as f:
+                yield f
@@ -0,0 +1,87 @@
+"""
+A gzip file may consist of several concatenated members, each of which can be
+decompressed on its own. This script re-encodes the Wikidata dump into such a
+multi-member file, where every member holds a fixed number of entities, and
+writes an index which maps entity ordinals to the offsets at which the members
+start. The result is still a valid 'latest-all.json.gz', but the parser can seek
+straight to any member instead of decompressing everything in front of it.
+
+    python3 dumpindex.py ../data/latest-all.json.gz ../data/latest-indexed.json.gz
+"""
+import argparse
+import bisect
+import gzip
+import itertools
+import json
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, List
+
+from decompress import Point, open_lines, resolve_method
+from helper import iter_lines
+
+def index_path(dump: Path) -> Path:
+    return dump.with_name(dump.name + ".idx")
+
+def read_index(dump: Path) -> List[Point]:
+    """ Read the restart points of the dump, or a single point at the start
+        of the file if the dump was never indexed. """
+    path = index_path(dump)
+    if not path.is_file():
+        return [(0, 0)]
+    with open(path, "r") as f:
+        return [tuple(point) for point in json.load(f)["points"]]
+
+def build_index(source: Path, target: Path, block: int, level: int) -> List[Point]:
+    points : List[Point] = []
+    with gzip.open(source) as src, open(target, "wb") as raw:
+        ordinal = 0
+        member = None
+        for line in src:
+            is_entity = len(line) > 3
+            # Start a new member every `block` entities.
+            if member is None or (is_entity and ordinal % block == 0 and ordinal != points[-1][0]):
+                if member is not None:
+                    member.close()
+                points.append((ordinal, raw.tell()))
+                member = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=level)
+
+            member.write(line)
+            if is_entity:
+                ordinal += 1
+                if ordinal % 1_000_000 == 0:
+                    print(f"{ordinal:,} entities indexed")
+        if member is not None:
+            member.close()
+
+    with open(index_path(target), "w") as f:
+        json.dump({"block": block, "entities": ordinal, "points": points}, f)
+    return points
+
+@contextmanager
+def open_dump(dump: Path, skip: int = 0, method: str = "python", threads: int = 1) -> Iterator[Iterable[bytes]]:
+    """ Open the dump positioned after the first `skip` entities, decompressed
+        with `method` (see decompress.py). When the dump has an index we seek to
+        the closest member in front of that entity and only decompress the
+        remainder of that member. """
+    points = read_index(dump)
+    method = resolve_method(method, dump, points, threads)
+    ordinal, offset = points[bisect.bisect_right(points, (skip, float("inf"))) - 1]
+    if offset != 0:
+        print(f"Seeking to entity {ordinal:,} at byte {offset:,}")
+
+    with open_lines(dump, method, points, offset, threads) as f:
+        for _ in itertools.islice(iter_lines(f), skip - ordinal):
+            pass
+        yield f
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Re-encode a Wikidata dump into indexed gzip members")
+    parser.add_argument("source", type=Path, help="Path of the original dump")
+    parser.add_argument("target", type=Path, help="Path of the re-encoded dump, the index is written next to it")
+    parser.add_argument("--block", dest="block", type=int, help="# entities per gzip member", default=10_000)
+    parser.add_argument("--level", dest="level", type=int, help="gzip compression level", default=6)
+    args = parser.parse_args()
+
+    points = build_index(args.source, args.target, args.block, args.level)
+    print(f"Wrote {len(points):,} restart points to {index_path(args.target)}")
@@ -1,13 +1,49 @@
-from typing import Dict, Optional
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
 from entityparsers.manager import EntData
+from entityparsers.entity import claim_arrays
+from entityparsers.ids import decode_id, encode_id
 
 class Coordinates(EntData):
+    schema = {
+        "entities": [("id", "id"), ("num_triples", "int32")],
+        "claims": [("subject", "id"), ("predicate", "id"), ("object", "id")],
+    }
+
+    __slots__ = ('coords', 'num_triples', 'predicates', 'objects')
+    array_slots = ('predicates', 'objects')
 
     def __init__(self, id: str):
         self.id = id
 
         self.coords : str = ""
         self.num_triples : int = 0
+        # The (predicate, object) pairs of the entity claims, as encoded ids.
+        self.predicates = array('i') # Properties always fit in an int32.
+        self.objects = array('q')
+
+    @property
+    def tracking(self) -> Dict[str, List[str]]:
+        tracking : Dict[str, List[str]] = {}
+        for predicate, obj in zip(self.predicates, self.objects):
+            tracking.setdefault(decode_id(predicate), []).append(decode_id(obj))
+        return tracking
+
+    @classmethod
+    def upgrade_state(cls, state: Dict) -> Dict:
+        if 'predicates' not in state:
+            state['predicates'], state['objects'] = claim_arrays(state.pop('tracking', {}))
+        return state
+
+    @staticmethod
+    def prefilter(line: bytes) -> bool:
+        return b'"P625"' in line
+
+    def records(self) -> Iterator[Tuple[str, Tuple]]:
+        subject = encode_id(self.id)
+        yield "entities", (subject, self.num_triples)
+        for predicate, obj in zip(self.predicates, self.objects):
+            yield "claims", (subject, predicate, obj)
 
     def process(self, data : Dict) -> EntData:
         statements : Optional[Dict] = data.get('claims') 
@@ -20,16 +56,16 @@ class Coordinates(EntData):
             return None
         
         for statement, claims in statements.items(): 
+            predicate = encode_id(statement)
             for claim in claims:
                 self.num_triples += 1
 
                 snak = claim['mainsnak']
                 claim_type = self.get_claim_type(snak)
     
-                # Add the entity referred to the correct tracking list.
+                # Add the entity referred to the tracked claims.
                 if claim_type == "wikibase-entityid":
-                    track = self.tracking.get(statement, [])
-                    track.append(snak['datavalue']['value']['id'])
-                    self.tracking[statement] = track
+                    self.predicates.append(predicate)
+                    self.objects.append(encode_id(snak['datavalue']['value']['id']))
 
         return self
\ No newline at end of file
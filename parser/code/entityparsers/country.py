@@ -1,11 +1,40 @@
-from typing import Dict, List, Optional
+from array import array
+from typing import Dict, Iterator, Optional, Tuple
 from entityparsers.manager import EntData
+from entityparsers.ids import NO_ID, as_code, encode_id
 
 class Country(EntData):
+    schema = {
+        "entities": [("id", "id"), ("country", "id")],
+        "territories": [("subject", "id"), ("territory", "id")],
+    }
+
+    __slots__ = ('country', 'territories')
+    array_slots = ('territories',)
+
     def __init__(self, id: str):
         self.id = id
-        self.country :str = "unknown"
-        self.territories : List[str] = []
+        self.country : int = NO_ID # Unknown
+        self.territories = array('q')
+
+    @classmethod
+    def upgrade_state(cls, state: Dict) -> Dict:
+        if state['country'] == "unknown":
+            state['country'] = NO_ID
+        state['country'] = as_code(state['country'])
+        if isinstance(state['territories'], list):
+            state['territories'] = array('q', map(as_code, state['territories']))
+        return state
+
+    @staticmethod
+    def prefilter(line: bytes) -> bool:
+        return b'"P17"' in line or b'"P131"' in line
+
+    def records(self) -> Iterator[Tuple[str, Tuple]]:
+        subject = encode_id(self.id)
+        yield "entities", (subject, self.country)
+        for territory in self.territories:
+            yield "territories", (subject, territory)
 
     def process(self, data : Dict) -> EntData:
         statements : Optional[Dict] = data.get('claims') 
@@ -23,13 +52,13 @@ class Country(EntData):
             for claim in territorial_claims:
                 snak = claim['mainsnak']
                 if self.get_claim_type(snak) == "wikibase-entityid":
-                    self.territories.append(snak['datavalue']['value']['id'])
+                    self.territories.append(encode_id(snak['datavalue']['value']['id']))
         else:   
             for claim in country_claims:
                 # Only save the first country
                 snak = claim['mainsnak']
                 if self.get_claim_type(snak) == "wikibase-entityid":
-                    self.country = snak['datavalue']['value']['id']
+                    self.country = encode_id(snak['datavalue']['value']['id'])
                 return self
 
         return self
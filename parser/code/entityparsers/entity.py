@@ -1,11 +1,90 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Optional
+from array import array
+import itertools
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from entityparsers.ids import as_code
+
+# Table name -> [(column name, column type)], see sinks.py for the column types.
+Schema = Dict[str, List[Tuple[str, str]]]
+
+# Claims are counted per value type in a fixed-index array instead of a dict per entity.
+CLAIM_TYPES = [
+    'wikibase-entityid', # This is the # of subject occurrences
+    'quantity',
+    'string',
+    'time',
+    'globecoordinate',
+    'monolingualtext',
+    'multilingualtext',
+    'unknown',
+]
+CLAIM_INDEX : Dict[str, int] = {claim_type: i for i, claim_type in enumerate(CLAIM_TYPES)}
+
+def claim_counts() -> array:
+    return array('i', [0] * len(CLAIM_TYPES))
+
+def count_array(counts: Dict[str, int]) -> array:
+    """ The claim counts of a dict by claim type, as kept before the counts were an array. """
+    counts_array = claim_counts()
+    for claim_type, count in counts.items():
+        counts_array[CLAIM_INDEX[claim_type]] = count
+    return counts_array
+
+def claim_arrays(tracking: Dict[str, List[str]]) -> Tuple[array, array]:
+    """ The objects of every predicate as (predicate, object) arrays of encoded ids. """
+    predicates, objects = array('i'), array('q')
+    for predicate, objs in tracking.items():
+        for obj in objs:
+            predicates.append(as_code(predicate))
+            objects.append(as_code(obj))
+    return predicates, objects
+
+def slot_state(state: Any) -> Dict:
+    """ The attributes in a pickled state. Objects with slots are pickled as
+        (None, slots), objects pickled before they had slots as their __dict__. """
+    return dict(state[1]) if isinstance(state, tuple) else dict(state)
 
 class EntData(ABC):
-    
+    # Entities are held in memory by the millions, so no parser has a __dict__.
+    __slots__ = ('id',)
+
+    # Slots holding an array, these are pickled as lists.
+    array_slots : Tuple[str, ...] = ()
+
+    # Tables this parser writes to in the columnar output format.
+    schema : Schema = {}
+
     def __init__(self, id: str):
         self.id = id
 
+    def __getstate__(self) -> Dict:
+        # An array pickles as raw 8-byte values, while pickle stores a list of
+        # small ints (e.g. encoded Q/P ids) in 2-5 bytes per value.
+        state = {}
+        for slot in itertools.chain.from_iterable(cls.__dict__.get('__slots__', ()) for cls in type(self).__mro__):
+            value = getattr(self, slot)
+            state[slot] = (value.typecode, value.tolist()) if slot in self.array_slots else value
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        for slot, value in self.upgrade_state(slot_state(state)).items():
+            setattr(self, slot, array(*value) if isinstance(value, tuple) and slot in self.array_slots else value)
+
+    @classmethod
+    def upgrade_state(cls, state: Dict) -> Dict:
+        """ Convert the state of an entity pickled before the parsers had slots
+            (its __dict__, with str ids, dicts and lists) to the current slots. """
+        return state
+
+    @staticmethod
+    def prefilter(line: bytes) -> bool:
+        """ Cheap check on the raw json line of an entity. Entities for which this
+            returns False are skipped without being decoded, so it must never
+            reject an entity which `process` would keep. """
+        return True
+
     @staticmethod
     def get_claim_type(snak : Dict) -> str:
         if snak['snaktype'] != 'value':
@@ -18,8 +97,43 @@ class EntData(ABC):
             return claim['mainsnak']['datavalue']['value']['id']
         return None
 
+    @abstractmethod
+    def records(self) -> Iterator[Tuple[str, Tuple]]:
+        """ Flatten the entity into (table, row) pairs, where the row holds
+            a value for every column of that table in `schema`. """
+        pass
+
     @abstractmethod
     def process(self, data : Dict) -> 'EntData':
         # https://stackoverflow.com/questions/33533148/how-do-i-type-hint-a-method-with-the-type-of-the-enclosing-class
         # Gemini cluster runs Python 3.6
-        pass
\ No newline at end of file
+        pass
+
+
+def deep_size(obj, seen: Set[int]) -> int:
+    """ Size of an object and everything it references, counting every object once. """
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, array)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        return size + sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return size + sum(deep_size(item, seen) for item in obj)
+
+    for slot in itertools.chain.from_iterable(getattr(cls, "__slots__", ()) for cls in type(obj).__mro__):
+        if hasattr(obj, slot):
+            size += deep_size(getattr(obj, slot), seen)
+    if hasattr(obj, "__dict__"):
+        size += deep_size(obj.__dict__, seen)
+    return size
+
+
+def mean_size(entities: Iterable[EntData]) -> float:
+    """ Mean memory per entity. Objects shared between the entities (e.g. interned strings) are counted once. """
+    seen : Set[int] = set()
+    sizes = [deep_size(entity, seen) for entity in entities]
+    return sum(sizes) / len(sizes) if len(sizes) > 0 else 0.0
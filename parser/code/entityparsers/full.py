@@ -1,23 +1,30 @@
-from typing import Dict, Optional
+from array import array
+from typing import Dict, Iterator, Optional, Tuple
 
 from entityparsers.manager import EntData
+from entityparsers.entity import CLAIM_INDEX, claim_counts, count_array
+from entityparsers.ids import as_code, encode_id
 
 class FullEnt(EntData):
+    schema = {
+        "entities": [("id", "id"), ("n_entity", "int32"), ("n_quantity", "int32"), ("n_string", "int32"),
+            ("n_time", "int32"), ("n_globecoordinate", "int32"), ("n_monolingualtext", "int32"),
+            ("n_multilingualtext", "int32"), ("sitelinks", "int32"), ("badges", "int32"),
+            ("badges_unique", "int32"), ("descriptions", "int32"), ("labels", "int32")],
+        "object_mentions": [("subject", "id"), ("object", "id"), ("count", "int32")],
+    }
+
+    __slots__ = ('mention_objects', 'mention_counts', 'claim_counts', 'sitelink_count', 'badges_count',
+        'badges_unique', 'description_count', 'label_count')
+    array_slots = ('mention_objects', 'mention_counts', 'claim_counts')
 
     def __init__(self, id: str):
         self.id = id
 
-        # Claims/statement data.
-        self.object_mentions : Dict[str, int] = {}
-        self.claim_counts : Dict[str, int] = {
-            'wikibase-entityid' : 0, # This is the # of subject occurrences
-            'quantity': 0,
-            'string': 0,
-            'time': 0,
-            'globecoordinate': 0,
-            'monolingualtext': 0,
-            'multilingualtext': 0
-        }
+        # Claims/statement data. How often each object is mentioned, as parallel arrays.
+        self.mention_objects = array('q')
+        self.mention_counts = array('i')
+        self.claim_counts = claim_counts() # 'unknown' claims are not counted.
 
         # Sitelink data
         self.sitelink_count = 0
@@ -28,6 +35,22 @@ class FullEnt(EntData):
         self.description_count = 0
         self.label_count = 0
 
+    @classmethod
+    def upgrade_state(cls, state: Dict) -> Dict:
+        if 'object_mentions' in state:
+            mentions = state.pop('object_mentions')
+            state['mention_objects'] = array('q', map(as_code, mentions.keys()))
+            state['mention_counts'] = array('i', mentions.values())
+            state['claim_counts'] = count_array(state['claim_counts'])
+        return state
+
+    def records(self) -> Iterator[Tuple[str, Tuple]]:
+        subject = encode_id(self.id)
+        yield "entities", (subject, *self.claim_counts[:CLAIM_INDEX['unknown']], self.sitelink_count,
+            self.badges_count, self.badges_unique, self.description_count, self.label_count)
+        for obj, count in zip(self.mention_objects, self.mention_counts):
+            yield "object_mentions", (subject, obj, count)
+
     def process(self, data: Dict) -> Optional[EntData]:
         if(data.get('claims') != None):
             self.process_claims(data['claims'])
@@ -44,17 +67,21 @@ class FullEnt(EntData):
         return self
 
     def process_claims(self, claims: Dict) -> None:
+        object_mentions : Dict[int, int] = {}
         for statements in claims.values():
             for claim in statements:
                 snak = claim['mainsnak']
                 claim_type = self.get_claim_type(snak)
 
                 if claim_type != "unknown":
-                    self.claim_counts[claim_type] += 1   
+                    self.claim_counts[CLAIM_INDEX[claim_type]] += 1   
         
                 if claim_type == "wikibase-entityid":
-                    id = snak['datavalue']['value']['id']
-                    self.object_mentions[id] = self.object_mentions.get(id, 0) + 1 
+                    id = encode_id(snak['datavalue']['value']['id'])
+                    object_mentions[id] = object_mentions.get(id, 0) + 1 
+
+        self.mention_objects = array('q', object_mentions.keys())
+        self.mention_counts = array('i', object_mentions.values())
 
                 
     def process_descriptions(self, descriptions: Dict) -> None:
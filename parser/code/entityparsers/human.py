@@ -1,10 +1,24 @@
-from typing import Dict, List, Optional
+from array import array
+from sys import intern
+from typing import Dict, Iterator, List, Optional, Tuple
 from entityparsers.manager import EntData
+from entityparsers.entity import CLAIM_INDEX, claim_arrays, claim_counts, count_array
+from entityparsers.ids import decode_id, encode_id
 
 class Human(EntData):
     # There should be ~9.062.359 humans in Wikidata 12/04/2021
     # 7660 professions
     # 40 types of actors
+    schema = {
+        "entities": [("id", "id"), ("n_entity", "int32"), ("n_quantity", "int32"), ("n_string", "int32"),
+            ("n_time", "int32"), ("n_globecoordinate", "int32"), ("n_monolingualtext", "int32"),
+            ("n_multilingualtext", "int32"), ("n_unknown", "int32")],
+        "claims": [("subject", "id"), ("predicate", "id"), ("object", "id")],
+        "languages": [("subject", "id"), ("language", "code")],
+    }
+
+    __slots__ = ('predicates', 'objects', 'claim_counts', 'languages')
+    array_slots = ('predicates', 'objects', 'claim_counts')
 
     def __init__(self, id: str):
         self.id = id
@@ -12,22 +26,44 @@ class Human(EntData):
         # Wikidata defines 177 properties to be applied to people
         # 38 of which are considered protected for living people (i.e,)
         # https://www.wikidata.org/wiki/Wikidata:Property_proposal/living_people_protection_class
-        self.tracking : Dict[str, List[str]] = {}
-        self.claim_counts : Dict[str, int] = {
-            'wikibase-entityid' : 0, # This is the # of subject occurrences
-            'quantity': 0,
-            'string': 0,
-            'time': 0,
-            'globecoordinate': 0,
-            'monolingualtext': 0,
-            'multilingualtext': 0,
-            "unknown": 0,
-        }
-
-        self.languages : List[str] = []
+        # The (predicate, object) pairs of the entity claims, as encoded ids.
+        self.predicates = array('i') # Properties always fit in an int32.
+        self.objects = array('q')
+        self.claim_counts = claim_counts()
+
+        self.languages : Tuple[str, ...] = ()
+
+    @property
+    def tracking(self) -> Dict[str, List[str]]:
+        """ The objects of every predicate, as in the Wikidata claims. """
+        tracking : Dict[str, List[str]] = {}
+        for predicate, obj in zip(self.predicates, self.objects):
+            tracking.setdefault(decode_id(predicate), []).append(decode_id(obj))
+        return tracking
+
+    @classmethod
+    def upgrade_state(cls, state: Dict) -> Dict:
+        if 'tracking' in state:
+            state['predicates'], state['objects'] = claim_arrays(state.pop('tracking'))
+            state['claim_counts'] = count_array(state['claim_counts'])
+            state['languages'] = tuple(map(intern, state['languages']))
+        return state
+
+    @staticmethod
+    def prefilter(line: bytes) -> bool:
+        # Any (X, P31, Q5) claim contains the string "Q5".
+        return b'"Q5"' in line
+
+    def records(self) -> Iterator[Tuple[str, Tuple]]:
+        subject = encode_id(self.id)
+        yield "entities", (subject, *self.claim_counts)
+        for predicate, obj in zip(self.predicates, self.objects):
+            yield "claims", (subject, predicate, obj)
+        for language in self.languages:
+            yield "languages", (subject, language)
 
     def process(self, data : Dict) -> EntData:
-        self.languages = list(data.get('labels', {}).keys())
+        self.languages = tuple(map(intern, data.get('labels', {}).keys()))
 
         statements : Optional[Dict] = data.get('claims') 
         if statements is None:
@@ -39,15 +75,15 @@ class Human(EntData):
             return None
         
         for statement, claims in statements.items(): 
+            predicate = encode_id(statement)
             for claim in claims:
                 snak = claim['mainsnak']
                 claim_type = self.get_claim_type(snak)
-                self.claim_counts[claim_type] += 1   
+                self.claim_counts[CLAIM_INDEX[claim_type]] += 1   
     
-                # Add the entity referred to the correct tracking list.
+                # Add the entity referred to the tracked claims.
                 if claim_type == "wikibase-entityid":
-                    track = self.tracking.get(statement, [])
-                    track.append(snak['datavalue']['value']['id'])
-                    self.tracking[statement] = track
+                    self.predicates.append(predicate)
+                    self.objects.append(encode_id(snak['datavalue']['value']['id']))
 
         return self
\ No newline at end of file
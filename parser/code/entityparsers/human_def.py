@@ -1,28 +1,49 @@
-from typing import Dict, List, Optional, Union
+from sys import intern
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 from entityparsers.manager import EntData
+from entityparsers.entity import slot_state
+from entityparsers.ids import NO_ID, as_code, encode_id
 from abc import abstractmethod
 
 class Fact:
-    def __init__(self,  references: Optional[List]):
-        self.references : List[Reference] = []
+    __slots__ = ('references',)
 
-        # Try to parse and references for this fact.
+    def __init__(self,  references: Optional[List]):
+        # Try to parse and references for this fact. Most facts have none,
+        # and all of those share the empty tuple.
+        self.references : Tuple[Reference, ...] = ()
         if references is None:
             return
         
-        for reference in references:
-            self.references.append(Reference(reference))
+        self.references = tuple(map(Reference, references))
+
+    def __setstate__(self, state) -> None:
+        # Pickled before facts had slots, the ids are str and the references a list.
+        state = slot_state(state)
+        self.references = tuple(state.pop('references'))
+        if isinstance(self, TimeFact):
+            state.setdefault('calendar', NO_ID)
+        for slot, value in state.items():
+            setattr(self, slot, as_code(value) if slot in ('object', 'calendar') else value)
 
     @abstractmethod
     def get_name(self) -> str:
         pass
 
+    def values(self) -> Tuple:
+        """ (kind, object, timestamp, precision, calendar) columns of the fact. """
+        return (self.get_name(), getattr(self, 'object', NO_ID), getattr(self, 'timestamp', ""),
+            getattr(self, 'precision', -1), getattr(self, 'calendar', NO_ID))
+
 class TimeFact(Fact):
+    __slots__ = ('calendar', 'timestamp', 'precision')
+
     def __init__(self, snak: Dict, references: Optional[List]):
         values = snak['datavalue']['value']
+        self.calendar = NO_ID
         if values.get('calendarmodel') != "http://www.wikidata.org/entity/Q1985727":
             # If not "gregorian proleptic calendar", store what it is.
-            self.calendar = values.get('calendarmodel').split("/").pop()
+            self.calendar = encode_id(values.get('calendarmodel').split("/").pop())
         
         self.timestamp = values['time']
         self.precision = values['precision']
@@ -34,8 +55,10 @@ class TimeFact(Fact):
 
 
 class EntityFact(Fact):
+    __slots__ = ('object',)
+
     def __init__(self, snak: Dict, references: Optional[List]):
-        self.object = snak['datavalue']['value']['id']
+        self.object = encode_id(snak['datavalue']['value']['id'])
         super().__init__(references)
     
     def get_name(self):
@@ -43,6 +66,8 @@ class EntityFact(Fact):
      
 
 class CoordFact(Fact):
+    __slots__ = ()
+
     def __init__(self, snak: Dict, references: Optional[List]):
         super().__init__(references)
 
@@ -70,8 +95,10 @@ def parse_snak(snak: Dict, references: Optional[List] ) -> Optional[Fact]:
 class Reference:
     """ A reference can consist of multiple predicates, and for each
         predicate there can be multiple entries."""
+    __slots__ = ('items',)
+
     def __init__(self, ref_snaks: Dict):
-        self.items : Dict[str, List[Fact]] = {}
+        self.items : Dict[int, List[Fact]] = {} # Keyed by the encoded predicate.
 
         references : Optional[Dict] = ref_snaks.get('snaks')
         if references is None:
@@ -83,22 +110,63 @@ class Reference:
                 # Lets assume there are no references to our references.
                 ref = parse_snak(snak, None)
                 if ref is not None:
-                    sub = self.items.get(pred, [])
-                    sub.append(ref)
-                    self.items[pred] = sub
+                    self.items.setdefault(encode_id(pred), []).append(ref)
+
+    def __setstate__(self, state) -> None:
+        self.items = {as_code(pred): facts for pred, facts in slot_state(state)['items'].items()}
+
+FACT_COLUMNS = [("kind", "code"), ("object", "id"), ("timestamp", "str"), ("precision", "int32"), ("calendar", "id")]
 
 class Human_def(EntData):
+    # Facts are numbered per subject, references point to a fact by that number.
+    schema = {
+        "facts": [("subject", "id"), ("fact", "int32"), ("predicate", "id")] + FACT_COLUMNS,
+        "references": [("subject", "id"), ("fact", "int32"), ("reference", "int32"), ("predicate", "id")] + FACT_COLUMNS,
+        "languages": [("subject", "id"), ("language", "code")],
+    }
+
+    __slots__ = ('tracking', 'languages')
+
     def __init__(self, id: str):
         self.id = id
         
-        self.tracking : Dict[str, Dict[str, List[Fact]]] = {
+        # Facts per kind, keyed by the encoded predicate.
+        self.tracking : Dict[str, Dict[int, List[Fact]]] = {
             'entity' : {},
             'temporal' : {},
             'coord'   : {},
         }
+        self.languages : Tuple[str, ...] = ()
+
+    @classmethod
+    def upgrade_state(cls, state: Dict) -> Dict:
+        state['tracking'] = {kind: {as_code(pred): facts for pred, facts in facts_by_pred.items()}
+            for kind, facts_by_pred in state['tracking'].items()}
+        state['languages'] = tuple(map(intern, state.get('languages', ())))
+        return state
+
+    @staticmethod
+    def prefilter(line: bytes) -> bool:
+        # Any (X, P31, Q5) claim contains the string "Q5".
+        return b'"Q5"' in line
+
+    def records(self) -> Iterator[Tuple[str, Tuple]]:
+        subject = encode_id(self.id)
+        fact_id = 0
+        for facts in self.tracking.values():
+            for pred_id, fact_list in facts.items():
+                for fact in fact_list:
+                    yield "facts", (subject, fact_id, pred_id, *fact.values())
+                    for ref_id, reference in enumerate(fact.references):
+                        for ref_pred, ref_facts in reference.items.items():
+                            for ref_fact in ref_facts:
+                                yield "references", (subject, fact_id, ref_id, ref_pred, *ref_fact.values())
+                    fact_id += 1
+        for language in self.languages:
+            yield "languages", (subject, language)
 
     def process(self, data : Dict) -> EntData:
-        self.languages = list(data.get('labels', {}).keys())
+        self.languages = tuple(map(intern, data.get('labels', {}).keys()))
 
         statements : Optional[Dict] = data.get('claims') 
         if statements is None:
@@ -117,8 +185,6 @@ class Human_def(EntData):
                 
                 # Store back in either objects/temporal data.
                 target = self.tracking[fact.get_name()]
-                sub = target.get(pred_id, [])
-                sub.append(fact)
-                target[pred_id] = sub
+                target.setdefault(encode_id(pred_id), []).append(fact)
 
         return self
\ No newline at end of file
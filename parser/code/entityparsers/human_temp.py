@@ -1,27 +1,76 @@
-from typing import Dict, List, Optional
+from sys import intern
+from typing import Dict, Iterator, List, Optional, Tuple
 from entityparsers.manager import EntData
+from entityparsers.entity import slot_state
+from entityparsers.ids import NO_ID, as_code, encode_id
 
 class TemporalData:
+    __slots__ = ('entity', 'temp_pred', 'calendar', 'timestamp', 'precision')
+
     def __init__(self, obj_entity: str, claim: Dict):
-        self.entity = obj_entity
-        self.temp_pred = claim['property']            
+        self.entity = encode_id(obj_entity)
+        self.temp_pred = encode_id(claim['property'])
 
         values = claim['datavalue']['value']
+        self.calendar = NO_ID
         if values.get('calendarmodel') != "http://www.wikidata.org/entity/Q1985727":
             # If not "gregorian proleptic calendar", store what it is.
-            self.calendar = values.get('calendarmodel').split("/").pop()
+            self.calendar = encode_id(values.get('calendarmodel').split("/").pop())
         
         self.timestamp = values['time']
         self.precision = values['precision']
 
+    def values(self) -> Tuple:
+        return self.timestamp, self.precision, self.calendar
+
+    def __setstate__(self, state) -> None:
+        # Pickled before it had slots, the ids are str and a gregorian calendar is left out.
+        state = slot_state(state)
+        self.entity = as_code(state['entity'])
+        self.temp_pred = as_code(state['temp_pred'])
+        self.calendar = as_code(state.get('calendar', NO_ID))
+        self.timestamp = state['timestamp']
+        self.precision = state['precision']
+
 class TempHuman(EntData):
+    # Direct temporal claims have no object and no qualifier, for qualifiers
+    # the predicate and object are those of the claim they qualify.
+    schema = {
+        "temporal": [("subject", "id"), ("predicate", "id"), ("object", "id"), ("qualifier", "id"),
+            ("timestamp", "str"), ("precision", "int32"), ("calendar", "id")],
+        "languages": [("subject", "id"), ("language", "code")],
+    }
+
+    __slots__ = ('temp_preds', 'indirect', 'languages')
 
     def __init__(self, id: int):
         self.id = id
 
         self.temp_preds : List[TemporalData] = []
-        self.indirect : Dict[str, List[TemporalData]] = {} 
+        self.indirect : Dict[int, List[TemporalData]] = {} # Keyed by the encoded predicate.
+        self.languages : Tuple[str, ...] = ()
+
+
+    @classmethod
+    def upgrade_state(cls, state: Dict) -> Dict:
+        state['indirect'] = {as_code(pred): temps for pred, temps in state['indirect'].items()}
+        state['languages'] = tuple(map(intern, state.get('languages', ())))
+        return state
+
+    @staticmethod
+    def prefilter(line: bytes) -> bool:
+        # Any (X, P31, Q5) claim contains the string "Q5".
+        return b'"Q5"' in line
 
+    def records(self) -> Iterator[Tuple[str, Tuple]]:
+        subject = encode_id(self.id)
+        for temp in self.temp_preds:
+            yield "temporal", (subject, temp.temp_pred, NO_ID, NO_ID, *temp.values())
+        for pred, temps in self.indirect.items():
+            for temp in temps:
+                yield "temporal", (subject, pred, temp.entity, temp.temp_pred, *temp.values())
+        for language in self.languages:
+            yield "languages", (subject, language)
 
     def process(self, data : Dict) -> EntData:
         statements : Optional[Dict] = data.get('claims') 
@@ -59,11 +108,10 @@ class TempHuman(EntData):
                         
                         temporal_info_found = True
                         temp_data = TemporalData(snak['datavalue']['value']['id'], q_claim)
-                        track = self.indirect.get(pred, [])
+                        track = self.indirect.setdefault(encode_id(pred), [])
                         track.append(temp_data)
-                        self.indirect[pred] = track
 
         if temporal_info_found:
-            self.languages = list(data.get('labels', {}).keys())
+            self.languages = tuple(map(intern, data.get('labels', {}).keys()))
             return self
         return None
\ No newline at end of file
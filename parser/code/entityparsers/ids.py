@@ -0,0 +1,95 @@
+"""
+Compact integer encoding of Wikidata identifiers. Storing 'Q5' or 'P106' as a
+Python str costs ~50 bytes per occurrence, an int in an array costs 8 bytes.
+
+The encoding is fixed, so every process (e.g. pool workers) produces the same
+codes without sharing a table. Items keep their number (Q42 is 42) and properties
+are negated (P106 is -106), so both stay small. The rare other entity types have
+their prefix in bits 56-59, and forms & senses of lexemes ('L7-F2') their
+sub-type in bits 54-55 and sub-number in bits 32-53. 0 (Q0) is no entity.
+
+Output files number identifiers densely instead, with an `IdTable`.
+"""
+from pathlib import Path
+from typing import Callable, Dict, Hashable, List, Optional, Union
+
+NO_ID = 0
+
+PREFIXES = ["Q", "L", "M", "E"]
+SUB_PREFIXES = ["", "F", "S"]
+
+PREFIX_CODES : Dict[str, int] = {prefix: i << 56 for i, prefix in enumerate(PREFIXES)}
+SUB_PREFIX_CODES : Dict[str, int] = {prefix: i << 54 for i, prefix in enumerate(SUB_PREFIXES)}
+
+NUMBER_MASK = (1 << 32) - 1
+SUB_NUMBER_MASK = (1 << 22) - 1
+
+def encode_id(entity_id: Optional[str]) -> int:
+    if not entity_id:
+        return NO_ID
+
+    if entity_id[0] == "P":
+        return -int(entity_id[1:])
+
+    prefix = PREFIX_CODES[entity_id[0]]
+    if "-" not in entity_id:
+        return prefix | int(entity_id[1:])
+
+    main, sub = entity_id.split("-")
+    return prefix | SUB_PREFIX_CODES[sub[0]] | int(sub[1:]) << 32 | int(main[1:])
+
+def as_code(entity_id: Union[str, int]) -> int:
+    """ The code of an identifier, which may already be encoded. """
+    return encode_id(entity_id) if isinstance(entity_id, str) else entity_id
+
+def decode_id(code: int) -> str:
+    if code == NO_ID:
+        return ""
+    if code < 0:
+        return "P" + str(-code)
+
+    entity_id = PREFIXES[code >> 56] + str(code & NUMBER_MASK)
+    sub_prefix = (code >> 54) & 3
+    if sub_prefix != 0:
+        entity_id += "-" + SUB_PREFIXES[sub_prefix] + str((code >> 32) & SUB_NUMBER_MASK)
+    return entity_id
+
+# Dense code of a missing identifier.
+MISSING = -1
+
+class IdTable:
+    """ Numbers identifiers densely (0, 1, 2, ... as int32) in order of first
+        occurrence. The table is stored as one identifier per line, where line i
+        has code i. New identifiers are appended to the file on every flush, so
+        codes never change once written and the file can be extended by later
+        runs. `parse` and `format` convert between lines and keys. """
+    def __init__(self, path: Path, parse: Callable[[str], Hashable] = str, format: Callable[[Hashable], str] = str):
+        self.path = path
+        self.format = format
+        self.codes : Dict[Hashable, int] = {}
+        self.keys : List[Hashable] = []
+        if path.is_file():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f.read().splitlines():
+                    self.intern(parse(line))
+        self.flushed = len(self.keys)
+
+    def intern(self, key: Hashable) -> int:
+        if not key:
+            return MISSING
+        code = self.codes.get(key)
+        if code is None:
+            code = len(self.keys)
+            self.codes[key] = code
+            self.keys.append(key)
+        return code
+
+    def flush(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for key in self.keys[self.flushed:]:
+                f.write(f"{self.format(key)}\n")
+        self.flushed = len(self.keys)
+
+def wikidata_ids(path: Path) -> IdTable:
+    """ The table of Wikidata identifiers, keyed by their `encode_id` code. """
+    return IdTable(path, encode_id, decode_id)
@@ -1,43 +1,34 @@
-from typing import Dict
+from typing import Dict, Iterator, Tuple
 from entityparsers.manager import EntData
+from entityparsers.ids import encode_id
 
 class Labels(EntData):
     # Fetch EN label for every entity
     # This for our own easy of use...
+    schema = {
+        "labels": [("id", "id"), ("label", "str")],
+    }
+
+    __slots__ = ('label',)
+
     def __init__(self, id: str):
         self.id = id
         self.label = ""        
 
+    def records(self) -> Iterator[Tuple[str, Tuple]]:
+        yield "labels", (encode_id(self.id), self.label)
+
     def process(self, data : Dict) -> EntData:
         labels = data.get("labels") 
         if labels is not None and len(labels) > 0:
             en = labels.get("en")
             if en is None:
-                self.label = labels[list(labels.keys())[0]]
+                self.label = labels[list(labels.keys())[0]]["value"]
             else:
                 self.label = en["value"]
 
         return self
 
-# How to parse the format:
-# Load all entity labels
-#start_time = time.time()
-# i, ent_labels = 0, {}
-# source = open(Path(os.path.abspath('')).resolve().joinpath("label.p"), "rb")
-# count = 0
-# with open(Path(os.path.abspath('')).resolve().joinpath("labels.txt"), "w") as f:
-#     while True:   
-#         batch = next_batch(source)
-#         if batch is None:
-#             break
-#         count += len(batch)
-#         for id, entity in batch.items():
-#             label = entity.label
-#             if type(entity) == Dict:
-#                 continue
-#             f.write(f"{entity.id}:{label}\n")
-#         del batch
-#         i += 1
-#         if i % 25 == 0:
-#             print(f"Parsed {count:,} labels in {i:,} batches. Took {time.time() - start_time} seconds")
-# source.close()
\ No newline at end of file
+# To look up labels, load the output into a store with entitystore.py:
+#   python3 entitystore.py label.shards label.db
+#   EntityStore(Path("label.db")).get("Q42").label
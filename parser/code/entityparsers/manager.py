@@ -1,23 +1,36 @@
-import pickle
+import itertools
+import json
+import os
 
 from typing import Dict, List, Optional
 from functools import partial
+from pathlib import Path
 
-from entityparsers.entity import EntData
+from entityparsers.entity import EntData, mean_size
 from entityparsers.full import FullEnt
 from entityparsers.human import Human
 from entityparsers.human_def import Human_def
 from entityparsers.human_temp import TempHuman
 from entityparsers.labels import Labels
+from entityparsers.people import People
 from entityparsers.country import Country
+from entityparsers.ids import IdTable, wikidata_ids
+from entityparsers.sinks import SINKS, ShardWriter
 # from entityparsers.women import Women
 
+# # entities sampled to estimate the memory per entity.
+SIZE_SAMPLE = 1000
+
+# Id tables by path, so that the managers of a multi-parser run share their codes.
+ID_TABLES : Dict[Path, IdTable] = {}
+
 class DataMgr():
 
     def __init__(self):
         self.entities : Dict[str, EntData] = {}
         self.processed = 0
         self.saved = 0
+        self.filtered = 0
 
         self.parsers = {
             "full" : partial(FullEnt),
@@ -26,9 +39,18 @@ class DataMgr():
             "human_temp": partial(TempHuman),
             "country" : partial(Country),
             "human_def": partial(Human_def),
+            "people": partial(People),
             # "women": partial(Women),
         }
         self.selected_parser : str = ""
+        self.output_format : str = "pickle"
+        self.sinks = {}
+        self.ids_path = Path("ids.txt")
+        self.ids : Optional[IdTable] = None
+        self.writer : Optional[ShardWriter] = None
+        self.dumped = 0 # Value of processed at the last dump.
+        self.checkpoint : Optional[Dict[str, int]] = None # Counters at the last dump.
+        self.entity_size = 0.0 # Estimated bytes per entity.
 
     def get_parsers(self) -> List[str]:
         return list(self.parsers.keys())
@@ -36,6 +58,39 @@ class DataMgr():
     def set_parser(self, parser: str) -> None:
         self.selected_parser = parser
         self.parser = self.parsers[parser]
+        self.prefilter = self.parser.func.prefilter
+
+    def get_formats(self) -> List[str]:
+        return list(SINKS.keys())
+
+    def set_format(self, output_format: str) -> None:
+        self.output_format = output_format
+
+    def set_ids(self, path: Path) -> None:
+        """ Use another table for the Wikidata identifiers in the output. """
+        self.ids_path = path
+
+    def get_ids(self) -> IdTable:
+        """ The id table is shared by the outputs of all parsers, and loaded on first use. """
+        if self.ids is None:
+            path = self.ids_path.resolve()
+            if path not in ID_TABLES:
+                ID_TABLES[path] = wikidata_ids(path)
+            self.ids = ID_TABLES[path]
+        return self.ids
+
+    def set_writer(self, writer: ShardWriter) -> None:
+        """ Write the dumps on the background thread of the writer. """
+        self.writer = writer
+
+    def accept_line(self, line: bytes) -> bool:
+        """ Check the raw line with the prefilter of the parser, rejected
+            lines count as processed but are never decoded. """
+        if self.prefilter(line):
+            return True
+        self.processed += 1
+        self.filtered += 1
+        return False
 
     def process_entity(self, ent_data: Dict) -> Optional[EntData]:
         self.processed += 1
@@ -44,12 +99,79 @@ class DataMgr():
         if entity is not None:
             self.saved += 1
         return entity
+
+    def merge_counts(self, processed: int, saved: int, filtered: int) -> None:
+        """ Account for entities that were processed by another (worker) manager. """
+        self.processed += processed
+        self.saved += saved
+        self.filtered += filtered
     
+    def get_sink(self, name: str):
+        if name not in self.sinks:
+            self.sinks[name] = SINKS[self.output_format](name, self.parser.func.schema, self.get_ids())
+        return self.sinks[name]
+
     def dump_current(self, name: str):
-        """ Append currently processed entities to file & wipe entities """ 
-        with open(f"{name}.p", "ab") as f:
-            pickle.dump(self.entities, f)
+        """ Write currently processed entities as the next shard & wipe entities.
+            Without entities, only the checkpoint moves. With a writer, this only
+            waits until the writer can take them. """ 
+        if len(self.entities) == 0 and self.processed == self.dumped and self.checkpoint is not None:
+            return
+        sink, entities, first = self.get_sink(name), self.entities, self.dumped
+        # The previous checkpoint is kept, so a run can be rolled back to it (see `read_checkpoint`).
+        checkpoint = {"processed": self.processed, "saved": self.saved, "filtered": self.filtered, "previous": self.checkpoint}
+        self.checkpoint = {key: checkpoint[key] for key in ("processed", "saved", "filtered")}
+        self.entity_size = mean_size(itertools.islice(entities.values(), SIZE_SAMPLE)) or self.entity_size
         self.entities = {}
+        self.dumped = self.processed
+
+        def write():
+            if len(entities) > 0:
+                sink.write(entities, first, checkpoint["processed"])
+            # Only move the checkpoint once the shard is on disk.
+            self.write_checkpoint(name, checkpoint)
+
+        if self.writer is None:
+            write()
+        else:
+            self.writer.submit(write)
+
+    def write_checkpoint(self, name: str, checkpoint: Dict) -> None:
+        """ Record how far into the dump we are, everything before it has been dumped. """
+        with open(f"{name}.ckpt.tmp", "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(f"{name}.ckpt.tmp", f"{name}.ckpt")
+
+    def start_at(self, skip: int) -> None:
+        """ Count the `skip` entities before the start of the run as processed, so
+            the checkpoints and shard ranges count from the start of the dump. """
+        self.processed = skip
+        self.dumped = skip
+        self.checkpoint = {"processed": skip, "saved": 0, "filtered": 0}
+
+    def has_checkpoint(self, name: str) -> bool:
+        return Path(f"{name}.ckpt").is_file()
+
+    def read_checkpoint(self, name: str, at: Optional[int] = None) -> int:
+        """ Restore the counters of the last checkpoint, or of the one before it if
+            that is at `at` entities. Shards written after the restored checkpoint
+            are dropped. Returns the # of entities to skip. """
+        with open(f"{name}.ckpt", "r") as f:
+            checkpoint = json.load(f)
+        if at is not None and checkpoint["processed"] != at:
+            previous = checkpoint.get("previous")
+            if previous is None or previous["processed"] != at:
+                raise ValueError(f"{name} has no checkpoint at {at:,} entities")
+            checkpoint = previous
+            self.write_checkpoint(name, checkpoint)
+        # A run can stop after a shard was listed, before the checkpoint moved past it.
+        self.get_sink(name).truncate(checkpoint["processed"])
+        self.checkpoint = {key: checkpoint.get(key, 0) for key in ("processed", "saved", "filtered")}
+        self.processed = checkpoint["processed"]
+        self.saved = checkpoint["saved"]
+        self.filtered = checkpoint.get("filtered", 0)
+        self.dumped = self.processed
+        return self.processed
         
     def add_entities(self, entities : Dict[str, EntData]) -> None:
         self.entities.update(entities)
@@ -57,5 +179,18 @@ class DataMgr():
     def get_size(self) -> int:
         return self.saved
 
+    def get_pending(self) -> int:
+        """ # entities waiting for the next dump. """
+        return len(self.entities)
+
+    def get_memory(self) -> float:
+        """ Estimated bytes held by the entities waiting for the next dump. """
+        if self.entity_size == 0 and len(self.entities) > 0:
+            self.entity_size = mean_size(itertools.islice(self.entities.values(), SIZE_SAMPLE))
+        return self.entity_size * len(self.entities)
+
     def get_processed(self) -> int:
         return self.processed
+
+    def get_filtered(self) -> int:
+        return self.filtered
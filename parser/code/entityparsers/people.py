@@ -0,0 +1,56 @@
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+from entityparsers.manager import EntData
+from entityparsers.ids import NO_ID, encode_id
+
+class People(EntData):
+    # Gender and occupations of every human, as looked up on the Wikidata API by the
+    # analyzer. Like there, an entity counts as human if its first P31 claim is Q5, and
+    # the gender/first occupation are taken from the first claim (none if it has no value).
+    schema = {
+        "people": [("id", "id"), ("gender", "id"), ("occupation", "id")],
+        "occupations": [("subject", "id"), ("occupation", "id")],
+    }
+
+    __slots__ = ('gender', 'occupation', 'occupations')
+    array_slots = ('occupations',)
+
+    def __init__(self, id: str):
+        self.id = id
+        self.gender : int = NO_ID
+        self.occupation : int = NO_ID
+        self.occupations = array('q')
+
+    @staticmethod
+    def prefilter(line: bytes) -> bool:
+        # Any (X, P31, Q5) claim contains the string "Q5".
+        return b'"Q5"' in line
+
+    def records(self) -> Iterator[Tuple[str, Tuple]]:
+        subject = encode_id(self.id)
+        yield "people", (subject, self.gender, self.occupation)
+        for occupation in self.occupations:
+            yield "occupations", (subject, occupation)
+
+    @staticmethod
+    def first_object(claims: Optional[List[Dict]]) -> int:
+        if not claims or claims[0]['mainsnak']['snaktype'] != 'value':
+            return NO_ID
+        return encode_id(claims[0]['mainsnak']['datavalue']['value']['id'])
+
+    def process(self, data : Dict) -> EntData:
+        statements : Optional[Dict] = data.get('claims')
+        if statements is None:
+            return None
+
+        if self.first_object(statements.get('P31')) != 5: # Q5
+            return None
+
+        self.gender = self.first_object(statements.get('P21'))
+        self.occupation = self.first_object(statements.get('P106'))
+        for claim in statements.get('P106', ()):
+            snak = claim['mainsnak']
+            if self.get_claim_type(snak) == "wikibase-entityid":
+                self.occupations.append(encode_id(snak['datavalue']['value']['id']))
+
+        return self
@@ -0,0 +1,261 @@
+"""
+Output formats of the parsers. Every dump of a parser is written as a numbered
+shard, and a shard is only listed in the 'manifest.json' of the output once it
+is completely on disk. For every shard the manifest holds the range of dump
+entities it covers ([first, last), counted like `DataMgr.processed`), the # of
+entities in it and a sha256 checksum of its files. The writes themselves can be
+done on a background thread by a `ShardWriter`.
+
+The pickle sink writes the parsed `EntData` objects as one pickled dictionary per
+shard, '{name}.shards/00000.p', which requires the parser classes to read them
+back (see `iter_pickles`). Entities pickled by older versions of the parsers are
+converted to the current classes when they are read (see `EntData.upgrade_state`).
+
+The columnar sink flattens the entities into the tables declared in the `schema`
+of the parser (see `EntData.records`) and writes every dump as a numbered shard
+of NumPy arrays, one '.npy' file per column, into the '{name}.cols' directory:
+
+    {name}.cols/schema.json                  tables & columns of the parser, path of the id table
+    {name}.cols/codes.txt                    interned strings, line i has code i
+    {name}.cols/00000/{table}.{column}.npy   a column of the first shard
+
+Wikidata identifiers are numbered in a single id table that is shared by the
+outputs of all parsers ('ids.txt' next to them by default), so the id columns
+of different outputs can be joined without decoding them.
+
+Column types are:
+    id     int32 code of a Wikidata identifier (e.g. 'Q5', 'P106') in the id table, -1 if missing.
+           `EntData.records` yields these as `encode_id` integers.
+    code   int32 code of another repeated string (e.g. 'en') in codes.txt, -1 if missing.
+    int32  plain integer.
+    str    utf-8 strings, stored as '{table}.{column}.data.npy' (uint8) and
+           '{table}.{column}.offsets.npy' (int64, string i is data[offsets[i]:offsets[i+1]]).
+
+Columns can be loaded on their own and are memory-mapped, see `iter_shards`.
+"""
+import hashlib
+import json
+import os
+import pickle
+import queue
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from entityparsers.entity import EntData, Schema
+from entityparsers.ids import IdTable
+
+def checksum(paths: List[Path]) -> str:
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(2**20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+def read_manifest(root: Path) -> List[Dict]:
+    path = root.joinpath("manifest.json")
+    if not path.is_file():
+        return []
+    with open(path, "r") as f:
+        return json.load(f)["shards"]
+
+class ShardedSink(ABC):
+    """ Numbers the shards of an output and keeps its manifest. A shard left
+        behind by a crash is not in the manifest, and is overwritten. """
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(exist_ok=True)
+        self.shards = read_manifest(root)
+
+    def write(self, entities: Dict[str, EntData], first: int, last: int) -> None:
+        number = len(self.shards)
+        files = self.write_shard(self.root.joinpath(f"{number:05d}"), entities)
+        self.shards.append({"shard": number, "first": first, "last": last, "entities": len(entities),
+            "bytes": sum(path.stat().st_size for path in files), "sha256": checksum(files)})
+        self.write_manifest()
+
+    def truncate(self, last: int) -> None:
+        """ Drop the shards after the first `last` dump entities, as when a run is
+            resumed from an earlier checkpoint. Their files are overwritten. """
+        shards = [entry for entry in self.shards if entry["last"] <= last]
+        if len(shards) < len(self.shards):
+            self.shards = shards
+            self.write_manifest()
+
+    def write_manifest(self) -> None:
+        # Replace the manifest in one go, so it never lists a partial shard.
+        path = self.root.joinpath("manifest.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({"shards": self.shards}, f, indent=1)
+        os.replace(f"{path}.tmp", path)
+
+    @abstractmethod
+    def write_shard(self, path: Path, entities: Dict[str, EntData]) -> List[Path]:
+        """ Write the entities to the shard at `path`, returns the files written. """
+        pass
+
+class PickleSink(ShardedSink):
+    def __init__(self, name: str, schema: Schema, ids: IdTable):
+        super().__init__(Path(f"{name}.shards"))
+
+    def write_shard(self, path: Path, entities: Dict[str, EntData]) -> List[Path]:
+        path = path.with_suffix(".p")
+        with open(path, "wb") as f:
+            pickle.dump(entities, f)
+        return [path]
+
+class ColumnarSink(ShardedSink):
+    def __init__(self, name: str, schema: Schema, ids: IdTable):
+        super().__init__(Path(f"{name}.cols"))
+        self.schema = schema
+        self.ids = ids
+        self.codes = IdTable(self.root.joinpath("codes.txt"))
+
+        with open(self.root.joinpath("schema.json"), "w") as f:
+            json.dump({"ids": str(ids.path.resolve()), "tables": schema}, f, indent=1)
+
+    def write_shard(self, path: Path, entities: Dict[str, EntData]) -> List[Path]:
+        columns = {table: [[] for _ in cols] for table, cols in self.schema.items()}
+        for entity in entities.values():
+            for table, row in entity.records():
+                for column, value in zip(columns[table], row):
+                    column.append(value)
+
+        path.mkdir(exist_ok=True)
+        files : List[Path] = []
+        for table, cols in self.schema.items():
+            for (column, kind), values in zip(cols, columns[table]):
+                files.extend(self.write_column(path.joinpath(f"{table}.{column}"), kind, values))
+
+        # The shard is only listed once the ids it uses are on disk.
+        self.ids.flush()
+        self.codes.flush()
+        return files
+
+    def write_column(self, path: Path, kind: str, values: List) -> List[Path]:
+        if kind == "id":
+            np.save(f"{path}.npy", np.fromiter(map(self.ids.intern, values), dtype=np.int32, count=len(values)))
+        elif kind == "code":
+            np.save(f"{path}.npy", np.fromiter(map(self.codes.intern, values), dtype=np.int32, count=len(values)))
+        elif kind == "int32":
+            np.save(f"{path}.npy", np.array(values, dtype=np.int32))
+        elif kind == "str":
+            encoded = [value.encode("utf-8") for value in values]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum(np.array([len(value) for value in encoded], dtype=np.int64), out=offsets[1:])
+            np.save(f"{path}.offsets.npy", offsets)
+            np.save(f"{path}.data.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+            return [Path(f"{path}.offsets.npy"), Path(f"{path}.data.npy")]
+        else:
+            raise ValueError(f"Unknown column type '{kind}'")
+        return [Path(f"{path}.npy")]
+
+class ShardWriter:
+    """ Runs the writes of the dumps on a background thread, in order, so the
+        parser can go on with the next entities. At most `pending` dumps wait
+        to be written, after that `submit` blocks, which bounds the memory.
+        Use a single writer for all parsers, as their outputs share the id table. """
+    def __init__(self, pending: int = 1):
+        self.jobs : queue.Queue = queue.Queue(maxsize=pending)
+        self.error : Optional[BaseException] = None
+        self.thread = threading.Thread(target=self.run, name="shard-writer", daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            # After a failure the remaining dumps are dropped, they would not be resumable.
+            if self.error is None:
+                try:
+                    job()
+                except BaseException as e:
+                    self.error = e
+
+    def check(self) -> None:
+        if self.error is not None:
+            raise RuntimeError("writing a dump failed") from self.error
+
+    def submit(self, job: Callable[[], None]) -> None:
+        self.check()
+        self.jobs.put(job)
+
+    def close(self) -> None:
+        """ Wait until all dumps are written. """
+        self.jobs.put(None)
+        self.thread.join()
+        self.check()
+
+    def __enter__(self) -> 'ShardWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+SINKS = {
+    "pickle": PickleSink,
+    "columnar": ColumnarSink,
+}
+
+def iter_pickles(root: Path) -> Iterator[Dict[str, EntData]]:
+    """ Yield the entities of a pickle output ('{name}.shards'), one shard at a time.
+        An output of the parsers before they were sharded ('{name}.p', a file of
+        appended dictionaries) is read one dictionary at a time. """
+    if root.is_file():
+        with open(root, "rb") as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+    for entry in read_manifest(root):
+        with open(root.joinpath(f"{entry['shard']:05d}.p"), "rb") as f:
+            yield pickle.load(f)
+
+def read_lines(path: Path) -> np.ndarray:
+    with open(path, "r", encoding="utf-8") as f:
+        return np.array(f.read().splitlines(), dtype=object)
+
+def read_ids(root: Path) -> np.ndarray:
+    """ The Wikidata identifiers used by a columnar output, indexed by their code.
+        The table is shared with other outputs, so it may also hold other identifiers. """
+    with open(root.joinpath("schema.json"), "r") as f:
+        return read_lines(Path(json.load(f)["ids"]))
+
+def read_codes(root: Path) -> np.ndarray:
+    """ The strings of the code columns of a columnar output, indexed by their code. """
+    return read_lines(root.joinpath("codes.txt"))
+
+def read_schema(root: Path) -> Schema:
+    with open(root.joinpath("schema.json"), "r") as f:
+        return json.load(f)["tables"]
+
+def iter_shards(root: Path, table: str, columns: Optional[List[str]] = None) -> Iterator[Dict[str, np.ndarray]]:
+    """ Yield the requested columns of a table, one shard at a time. Id, code
+        and int32 columns are memory-mapped, str columns are decoded. """
+    kinds = dict(read_schema(root)[table])
+    columns = columns if columns is not None else list(kinds.keys())
+    for entry in read_manifest(root):
+        shard = root.joinpath(f"{entry['shard']:05d}")
+        result = {}
+        for column in columns:
+            path = shard.joinpath(f"{table}.{column}")
+            if kinds[column] == "str":
+                offsets = np.load(f"{path}.offsets.npy")
+                data = np.load(f"{path}.data.npy", mmap_mode="r").tobytes()
+                result[column] = np.array([data[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])], dtype=object)
+            else:
+                result[column] = np.load(f"{path}.npy", mmap_mode="r")
+        yield result
+
+def read_table(root: Path, table: str, columns: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+    """ Load the requested columns of a table from all shards. """
+    shards = list(iter_shards(root, table, columns))
+    if len(shards) == 0:
+        return {}
+    return {column: np.concatenate([shard[column] for shard in shards]) for column in shards[0]}
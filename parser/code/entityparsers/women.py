@@ -1,19 +1,58 @@
-from typing import Dict, List, Optional
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
 from entityparsers.manager import EntData
+from entityparsers.entity import claim_arrays
+from entityparsers.ids import decode_id, encode_id
+
+TRACKED = [
+    'P6', 'P17', 'P26', 'P27', 'P31',
+    'P39', 'P54', 'P69', 'P102', 'P106',
+    'P108', 'P131', 'P150', 'P166', 
+    'P190', 'P463', 'P512', 'P551',
+    'P579', 'P793', 'P1346', 'P1376', 
+    'P1411', 'P1435', 'P2962',
+]
+TRACKED_CODES : Dict[str, int] = {pred: encode_id(pred) for pred in TRACKED}
 
 class Women(EntData):
+    schema = {
+        "claims": [("subject", "id"), ("predicate", "id"), ("object", "id")],
+    }
+
+    __slots__ = ('predicates', 'objects')
+    array_slots = ('predicates', 'objects')
+
     def __init__(self, id: str):
         self.id = id
 
-        self.track : Dict[str, List[str]] = { 
-            'P6' : [], 'P17' : [], 'P26' : [], 'P27' : [], 'P31' : [],
-            'P39' : [], 'P54' : [], 'P69' : [], 'P102' : [], 'P106': [],
-            'P108' : [], 'P131' : [], 'P150' : [], 'P166' : [], 
-            'P190' : [], 'P463' : [], 'P512' : [], 'P551' : [],
-            'P579' : [], 'P793' : [], 'P1346' : [], 'P1376' : [], 
-            'P1411' : [], 'P1435' : [], 'P2962' : [],
-        }
-        
+        # The (predicate, object) pairs of the claims with a TRACKED predicate, as encoded ids.
+        self.predicates = array('i') # Properties always fit in an int32.
+        self.objects = array('q')
+
+    @property
+    def track(self) -> Dict[str, List[str]]:
+        """ The objects of every tracked predicate. """
+        track : Dict[str, List[str]] = {pred: [] for pred in TRACKED}
+        for predicate, obj in zip(self.predicates, self.objects):
+            track[decode_id(predicate)].append(decode_id(obj))
+        return track
+
+    @classmethod
+    def upgrade_state(cls, state: Dict) -> Dict:
+        if 'track' in state:
+            state['predicates'], state['objects'] = claim_arrays(state.pop('track'))
+        return state
+
+    @staticmethod
+    def prefilter(line: bytes) -> bool:
+        # Must contain both human (Q5) and female (Q6581072).
+        return b'"Q5"' in line and b'"Q6581072"' in line
+
+    def records(self) -> Iterator[Tuple[str, Tuple]]:
+        subject = encode_id(self.id)
+        for predicate, obj in zip(self.predicates, self.objects):
+            yield "claims", (subject, predicate, obj)
+
     def process(self, data : Dict) -> EntData:
         statements : Optional[Dict] = data.get('claims') 
         if statements is None:
@@ -29,13 +68,15 @@ class Women(EntData):
             return None
         
         for statement, claims in statements.items():
-            if statement in self.track: 
+            predicate = TRACKED_CODES.get(statement)
+            if predicate is not None: 
                 for claim in claims:
                     snak = claim['mainsnak']
                     claim_type = self.get_claim_type(snak)
     
                     # Add the entity referred to the correct tracking list.
                     if claim_type == "wikibase-entityid" and snak['snaktype'] == 'value':
-                        self.track[statement].append(snak['datavalue']['value']['id'])
+                        self.predicates.append(predicate)
+                        self.objects.append(encode_id(snak['datavalue']['value']['id']))
 
         return self
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""
+Random access to the entities of a parser. Reading a single entity from the
+pickle output means unpickling the shards one by one, so this script loads the
+shards into an SQLite database instead, keyed by the `encode_id` code of the
+entity. The database is a B-tree on that integer key, so a lookup only touches a
+few pages and takes microseconds, without loading the rest of the output.
+
+    python3 entitystore.py label.shards label.db
+    >>> with EntityStore(Path("label.db")) as labels:
+    ...     labels.get("Q42").label
+"""
+import argparse
+import pickle
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+# Loads the parser classes, which are required to unpickle the entities.
+import entityparsers.manager
+from entityparsers.entity import EntData
+from entityparsers.ids import encode_id
+from entityparsers.sinks import iter_pickles
+
+# SQLite limits the # parameters of a query.
+MAX_PARAMETERS = 900
+
+def build_store(source: Path, target: Path) -> int:
+    """ Load all shards of a pickle output into a new store, returns the # of
+        entities in it. An entity that is in several shards (e.g. after a run
+        was repeated) is kept as last seen. """
+    if target.exists():
+        target.unlink()
+    connection = sqlite3.connect(str(target))
+    # The store is built in one go, if that fails it is simply built again.
+    connection.execute("PRAGMA journal_mode = OFF")
+    connection.execute("PRAGMA synchronous = OFF")
+    connection.execute("CREATE TABLE entities (id INTEGER PRIMARY KEY, data BLOB NOT NULL)")
+
+    with connection:
+        for shard in iter_pickles(source):
+            connection.executemany("INSERT OR REPLACE INTO entities VALUES (?, ?)",
+                ((encode_id(entity_id), pickle.dumps(entity, protocol=pickle.HIGHEST_PROTOCOL)) for entity_id, entity in shard.items()))
+    count = connection.execute("SELECT COUNT(*) FROM entities").fetchone()[0]
+    connection.execute("VACUUM")
+    connection.close()
+    return count
+
+class EntityStore:
+    """ Read-only access to a store made by `build_store`. """
+    def __init__(self, path: Path):
+        self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+    def get(self, entity_id: str) -> Optional[EntData]:
+        row = self.connection.execute("SELECT data FROM entities WHERE id = ?", (encode_id(entity_id),)).fetchone()
+        return pickle.loads(row[0]) if row is not None else None
+
+    def get_many(self, entity_ids: Iterable[str]) -> Dict[str, EntData]:
+        """ The entities that are in the store, by their id. """
+        codes : List[int] = list(set(map(encode_id, entity_ids)))
+        result : Dict[str, EntData] = {}
+        for i in range(0, len(codes), MAX_PARAMETERS):
+            chunk = codes[i:i + MAX_PARAMETERS]
+            query = f"SELECT data FROM entities WHERE id IN ({','.join('?' * len(chunk))})"
+            for (data,) in self.connection.execute(query, chunk):
+                entity = pickle.loads(data)
+                result[entity.id] = entity
+        return result
+
+    def __contains__(self, entity_id: str) -> bool:
+        return self.connection.execute("SELECT 1 FROM entities WHERE id = ?", (encode_id(entity_id),)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM entities").fetchone()[0]
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> 'EntityStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build a random access store from the pickle output of a parser")
+    parser.add_argument("source", type=Path, help="Output folder of the parser, e.g. 'label.shards'")
+    parser.add_argument("target", type=Path, help="Path of the store, e.g. 'label.db'")
+    args = parser.parse_args()
+
+    start = time.time()
+    count = build_store(args.source, args.target)
+    print(f"Stored {count:,} entities in {args.target} in {time.time() - start:.0f} seconds")
@@ -1,8 +1,7 @@
-from gzip import GzipFile
-from typing import List, Tuple
+from typing import Dict, Iterable, Iterator, List
 import time
-import json
 
+from decoders import Decoder
 from entityparsers.manager import DataMgr
 
 def running_time(start):
@@ -11,37 +10,58 @@ def running_time(start):
     secs = diff % 60
     return int(mins), int(secs)
 
-def read_lines(file : GzipFile) -> List:
-    if file.closed:
-        return []
-    
-    bytelines = file.readlines(3 * int(1E8)) # Read 300MB, this will expand to ~3GB
+# Default upper bound on the size of a batch of raw lines held in memory.
+BATCH_BYTES = 64 * 2**20
+
+def iter_lines(file : Iterable[bytes]) -> Iterator[bytes]:
+    """ Stream the raw entity lines from the dump. The first & last line from
+        the document ('[', ']') are skipped by length. """
+    for line in file:
+        if len(line) > 3:
+            yield line
+
+def iter_batches(file : Iterable[bytes], max_bytes: int = BATCH_BYTES) -> Iterator[List[bytes]]:
+    """ Group the raw entity lines into batches of at most `max_bytes`, so
+        that memory use is bounded by the batch size rather than the dump. """
+    batch : List[bytes] = []
+    size = 0
+    for line in iter_lines(file):
+        batch.append(line)
+        size += len(line)
+        if size >= max_bytes:
+            yield batch
+            batch, size = [], 0
 
-    # Parse the bytelines in to json. We remove ",\n" chars from all the lines
-    # and the first & last line from the document ('[', ']') by filtering length.
-    strlines = []
-    for line in bytelines:
-        utf8_line = line.decode('utf-8')
-        if len(utf8_line) > 2:
-            strlines.append(json.loads(utf8_line[:-2]))
+    if len(batch) > 0:
+        yield batch
 
-    return strlines
+def iter_entities(lines: Iterable[bytes], decode: Decoder) -> Iterator[Dict]:
+    """ Lazily parse the lines into json, one entity at a time. """
+    return map(decode, lines)
 
-def check_progress(data: DataMgr, passed: int, iter_time, start_time) -> Tuple[bool, bool]:
-    saved = data.get_size()
+def split_batch(lines: List[bytes], parts: int) -> Iterator[List[bytes]]:
+    """ Split a batch of lines into chunks for the worker pool. We use a
+        few chunks per worker so that a slow chunk does not stall the pool. """
+    size = max(1, -(-len(lines) // (parts * 4)))
+    for i in range(0, len(lines), size):
+        yield lines[i:i + size]
+
+def check_progress(managers: List[DataMgr], passed: int, iter_time, start_time) -> bool:
+    """ Print the counters once another 100k entities are saved. """
+    # With several parsers, the one that saves the most entities sets the pace.
+    saved = max(data.get_size() for data in managers)
     
-    major = False
     minor = int(saved / 100_000) > passed
     if minor:
         iter_mins, iter_secs = running_time(iter_time) 
         total_mins, total_secs = running_time(start_time)
-        print(f"{data.get_processed():,} entities processed, {saved:,} saved. Last iter in {iter_mins}:{iter_secs}, total time {total_mins}:{total_secs} ")
-
-    # Dump every ~1m entities
-    if passed != 0 and passed % 10 == 0 :
-        major = True
-        print("Starting dump")
-        data.dump_current(data.selected_parser)
-        print("Finished dump")
-        
-    return major, minor
\ No newline at end of file
+        for data in managers:
+            print(f"{data.selected_parser}: {data.get_processed():,} entities processed, {data.get_filtered():,} skipped by prefilter, {data.get_size():,} saved. Last iter in {iter_mins}:{iter_secs}, total time {total_mins}:{total_secs} ")
+    return minor
+
+def dump_due(managers: List[DataMgr], max_entities: int, max_bytes: int) -> bool:
+    """ Whether the managers should dump their entities: once one of them holds
+        `max_entities`, or together they hold an estimated `max_bytes`. """
+    if max_bytes > 0 and sum(data.get_memory() for data in managers) >= max_bytes:
+        return True
+    return any(data.get_pending() >= max_entities for data in managers)
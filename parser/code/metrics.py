@@ -0,0 +1,139 @@
+"""
+Timing of the stages of a parser run: reading (decompressing) batches of lines,
+decoding the json, `process` of every parser, adding the entities to the managers
+and dumping them. The time spent per stage is emitted periodically as json lines,
+both since the previous line and in total, together with the counters of every
+parser. With workers, the decode and parse times are summed over the workers, and
+'wait' is the time the main process waited for them. Timing every entity costs a
+little, so decode and parse are only timed when the metrics are written.
+
+A subset of the batches can be profiled with cProfile, every profile is written
+as '{batch}.prof' (or '{batch}-{chunk}.prof' by a worker) for `pstats`.
+"""
+import cProfile
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, TypeVar
+
+from entityparsers.manager import DataMgr
+
+# The resource module only exists on Unix, on Windows the peak memory comes from psutil if it is installed.
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+T = TypeVar("T")
+_END = object()
+
+class Metrics:
+    def __init__(self, path: Optional[Path] = None, interval: float = 60.0, profile_dir: Optional[Path] = None, profile_every: int = 0):
+        self.path = path
+        self.interval = interval
+        self.profile_dir = profile_dir
+        self.profile_every = profile_every
+        if profile_dir is not None:
+            profile_dir.mkdir(parents=True, exist_ok=True)
+
+        self.start = time.time()
+        self.last_emit = self.start
+        self.batches = 0
+        self.totals : Dict[str, float] = defaultdict(float)
+        self.current : Dict[str, float] = defaultdict(float)
+
+    @property
+    def detailed(self) -> bool:
+        """ Whether decode & parse are timed per entity. """
+        return self.path is not None
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.totals[stage] += seconds
+        self.current[stage] += seconds
+
+    def merge(self, seconds: Dict[str, float]) -> None:
+        """ Add the stage times measured elsewhere, e.g. by a worker. """
+        for stage, value in seconds.items():
+            self.add(stage, value)
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def timed(self, items: Iterable[T], stage: str) -> Iterator[T]:
+        """ Time how long it takes to produce every item. """
+        items = iter(items)
+        while True:
+            start = time.perf_counter()
+            item = next(items, _END)
+            self.add(stage, time.perf_counter() - start)
+            if item is _END:
+                return
+            yield item
+
+    def profile_path(self, batch: int) -> Optional[str]:
+        """ Where to write the profile of a batch (without '.prof'), if it is profiled. """
+        if self.profile_dir is None or self.profile_every <= 0 or batch % self.profile_every != 0:
+            return None
+        return str(self.profile_dir.joinpath(f"{batch:06d}"))
+
+    def end_batch(self, managers: List[DataMgr]) -> None:
+        self.batches += 1
+        if time.time() - self.last_emit >= self.interval:
+            self.emit(managers)
+
+    def emit(self, managers: List[DataMgr]) -> None:
+        if self.path is None:
+            return
+        now = time.time()
+        record = {
+            "time": now,
+            "elapsed": now - self.start,
+            "interval": now - self.last_emit,
+            "batches": self.batches,
+            "stages": dict(self.current),
+            "totals": dict(self.totals),
+            "parsers": {data.selected_parser: {"processed": data.get_processed(), "filtered": data.get_filtered(), "saved": data.get_size()}
+                for data in managers},
+        }
+        peak = peak_rss_mb()
+        if peak is not None:
+            record["peak_rss_mb"] = peak
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        self.current = defaultdict(float)
+        self.last_emit = now
+
+def peak_rss_mb() -> Optional[float]:
+    """ Peak memory of this process in MB, None if it can not be measured here. """
+    if resource is not None:
+        # ru_maxrss is in kB on Linux.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+    if psutil is not None:
+        # On Windows, the peak working set in bytes.
+        return psutil.Process().memory_info().peak_wset / 2**20
+    return None
+
+@contextmanager
+def profiled(path: Optional[str]) -> Iterator[None]:
+    """ Profile the block into '{path}.prof', or do nothing without a path. """
+    if path is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(f"{path}.prof")
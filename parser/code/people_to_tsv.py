@@ -0,0 +1,33 @@
+"""
+Write the output of the people parser as a tab separated table of every human:
+id, gender, first occupation and all occupations (comma separated). Place it in
+the metadata folder of the analyzer as 'people.tsv', which then looks up genders
+and occupations in it instead of on the Wikidata API.
+
+    python3 people_to_tsv.py people.shards people.tsv
+"""
+import argparse
+import time
+from pathlib import Path
+
+# Loads the parser classes, which are required to unpickle the entities.
+import entityparsers.manager
+from entityparsers.ids import decode_id
+from entityparsers.sinks import iter_pickles
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write the output of the people parser as a table")
+    parser.add_argument("source", type=Path, help="Output folder of the people parser, e.g. 'people.shards'")
+    parser.add_argument("target", type=Path, help="Path of the table, e.g. 'people.tsv'")
+    args = parser.parse_args()
+
+    start = time.time()
+    count = 0
+    with open(args.target, "w", encoding="utf-8") as f:
+        f.write("id\tgender\toccupation\toccupations\n")
+        for shard in iter_pickles(args.source):
+            for person in shard.values():
+                occupations = ",".join(map(decode_id, person.occupations))
+                f.write(f"{person.id}\t{decode_id(person.gender)}\t{decode_id(person.occupation)}\t{occupations}\n")
+            count += len(shard)
+    print(f"Wrote {count:,} people to {args.target} in {time.time() - start:.0f} seconds")
@@ -0,0 +1,185 @@
+"""
+Extract a subset of entities and their triples from the pickle output of a
+parser which keeps its claims as `predicates`/`objects` arrays (e.g. human or
+women), driven by a json config. The entities are grouped by the first object
+of a predicate (e.g. their first occupation), and per group the best ranked
+entities are kept, up to a quota. The shards are read once, and only the
+current top entities of every group and their triples are held in memory.
+
+    python3 subsets.py configs/women.json
+
+A config holds (paths are relative to the working directory):
+    source               output folder of the parser, e.g. "code/women.shards"
+    output               tab separated triples that are written
+    group_by             predicate whose first object is the group of an entity
+    quotas               # entities per group, {group: count}, in output order
+    balance              instead of quotas, match the # subjects per group in a triples file:
+                         {"triples": path, "predicate": "P106", "groups": [...], "scale": 1.0}
+    require              optional, {predicate: [objects]}, an entity needs one of the objects for every predicate
+    rank                 how entities are ranked within a group, one of RANKINGS
+    existing             optional, file of comma separated ids, objects of the triples must be one of them
+    unfiltered           predicates whose objects are kept even if they do not exist
+    exclude              predicates which are never written
+    predicate_order      optional, order of the predicates of an entity in the output,
+                         by default in order of first appearance
+
+Entities are ranked by the highest `rank` first, ties are broken on the id as a
+string. An entity which is in several shards (e.g. after a run was repeated)
+counts as last seen.
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Loads the parser classes, which are required to unpickle the entities.
+import entityparsers.manager
+from entityparsers.entity import EntData
+from entityparsers.ids import decode_id, encode_id
+from entityparsers.sinks import iter_pickles
+
+# Ranking functions, from the exploded claims of a shard to a rank per subject.
+RANKINGS : Dict[str, Callable[[pd.DataFrame], pd.Series]] = {
+    # Number of unique predicates with a value.
+    "predicates": lambda claims: claims.groupby("subject").predicate.nunique(),
+    # Number of claims.
+    "claims": lambda claims: claims.groupby("subject").size(),
+    # Number of claims whose object exists.
+    "existing": lambda claims: claims[claims.exists].groupby("subject").size(),
+}
+
+def explode(shard: Dict[str, EntData], number: int) -> pd.DataFrame:
+    """ One row per claim of the entities in the shard: the subject, predicate &
+        object as encoded ids, and the position of the claim in the shard. """
+    entities = list(shard.values())
+    counts = np.fromiter((len(entity.predicates) for entity in entities), dtype=np.int64, count=len(entities))
+    subjects = np.fromiter(map(encode_id, shard.keys()), dtype=np.int64, count=len(entities))
+    claims = pd.DataFrame({
+        "subject": np.repeat(subjects, counts),
+        "predicate": np.concatenate([np.frombuffer(entity.predicates, dtype=np.int32) for entity in entities] + [np.empty(0, np.int32)]),
+        "object": np.concatenate([np.frombuffer(entity.objects, dtype=np.int64) for entity in entities] + [np.empty(0, np.int64)]),
+    })
+    claims["position"] = np.arange(len(claims))
+    claims["shard"] = number
+    return claims
+
+def read_ids(path: Path) -> np.ndarray:
+    with open(path, "r") as f:
+        return np.fromiter(map(encode_id, f.read().split(",")), dtype=np.int64)
+
+def balance_quotas(balance: Dict) -> Dict[str, int]:
+    """ # distinct subjects per object of the predicate in a triples file, scaled. """
+    triples = pd.read_csv(balance["triples"], sep="\t", header=None, names=["s", "p", "o"], dtype=str)
+    counts = triples[triples.p == balance["predicate"]].drop_duplicates(["s", "o"]).groupby("o").size()
+    counts = counts.sort_values(ascending=False, kind="mergesort")
+    groups = balance.get("groups", list(counts.index))
+    return {group: int(round(counts.get(group, 0) * balance.get("scale", 1.0))) for group in groups}
+
+def decode_column(codes: pd.Series) -> pd.Series:
+    """ Decode every unique id only once. """
+    unique = codes.unique()
+    return codes.map(pd.Series([decode_id(code) for code in unique], index=unique))
+
+class Extractor:
+    def __init__(self, config: Dict):
+        quotas = config["quotas"] if "quotas" in config else balance_quotas(config["balance"])
+        self.quotas = pd.Series(list(quotas.values()), index=[encode_id(group) for group in quotas], dtype=np.int64)
+        self.group_order = pd.Series(range(len(self.quotas)), index=self.quotas.index)
+
+        self.group_by = encode_id(config["group_by"])
+        self.rank = RANKINGS[config.get("rank", "predicates")]
+        self.require = {encode_id(pred): [encode_id(obj) for obj in objects] for pred, objects in config.get("require", {}).items()}
+        self.existing : Optional[np.ndarray] = read_ids(Path(config["existing"])) if "existing" in config else None
+        self.unfiltered = [encode_id(pred) for pred in config.get("unfiltered", [])]
+        self.exclude = [encode_id(pred) for pred in config.get("exclude", [])]
+        order = config.get("predicate_order")
+        self.predicate_order = pd.Series(range(len(order)), index=[encode_id(pred) for pred in order]) if order else None
+
+        # The current top entities of every group, and their triples.
+        self.top = pd.DataFrame({"subject": np.empty(0, np.int64), "shard": np.empty(0, np.int64), "group": np.empty(0, np.int64),
+            "rank": np.empty(0, np.int64), "name": np.empty(0, object)})
+        self.triples : List[pd.DataFrame] = []
+        self.seen = 0
+
+    def add_shard(self, shard: Dict[str, EntData], number: int) -> None:
+        claims = explode(shard, number)
+        claims["exists"] = claims.object.isin(self.existing) if self.existing is not None else True
+        subjects = pd.Series(np.fromiter(map(encode_id, shard.keys()), dtype=np.int64, count=len(shard)))
+        self.seen += len(subjects)
+
+        # The entities which pass the filters, with a group that has a quota.
+        eligible = subjects
+        for pred, objects in self.require.items():
+            eligible = eligible[eligible.isin(claims.subject[(claims.predicate == pred) & claims.object.isin(objects)])]
+        groups = claims[claims.predicate == self.group_by].groupby("subject").object.first()
+        candidates = pd.DataFrame({"subject": eligible.values})
+        candidates["shard"] = number
+        candidates["group"] = candidates.subject.map(groups).fillna(0).astype(np.int64).values
+        candidates = candidates[candidates.group.isin(self.quotas.index)]
+        candidates["rank"] = candidates.subject.map(self.rank(claims)).fillna(0).astype(np.int64).values
+        candidates["name"] = [decode_id(subject) for subject in candidates.subject]
+
+        # A later copy of an entity replaces the earlier one.
+        top = self.top[~self.top.subject.isin(subjects)]
+        self.top = self.select(pd.concat([top, candidates], ignore_index=True))
+
+        keep = claims.subject.isin(self.top.subject[self.top.shard == number]) & ~claims.predicate.isin(self.exclude) \
+            & (claims.predicate.isin(self.unfiltered) | claims.exists)
+        self.triples.append(claims.loc[keep, ["subject", "predicate", "object", "position", "shard"]])
+        self.triples = [self.in_top(triples) for triples in self.triples]
+
+    def select(self, candidates: pd.DataFrame) -> pd.DataFrame:
+        """ The best ranked candidates of every group, up to its quota. """
+        candidates = candidates.sort_values(["rank", "name"], ascending=[False, True], kind="mergesort")
+        return candidates[candidates.groupby("group").cumcount() < candidates.group.map(self.quotas)]
+
+    def in_top(self, triples: pd.DataFrame) -> pd.DataFrame:
+        if len(triples) == 0:
+            return triples
+        index = pd.MultiIndex.from_arrays([triples.subject, triples.shard])
+        return triples[index.isin(pd.MultiIndex.from_arrays([self.top.subject, self.top.shard]))]
+
+    def result(self) -> pd.DataFrame:
+        """ The triples of the selected entities, per group in the order of the
+            quotas, from the best ranked entity down. """
+        found = self.top.groupby("group").size()
+        for group, quota in self.quotas.items():
+            if found.get(group, 0) < quota:
+                print(f"Only found {found.get(group, 0)} of {quota} entities for {decode_id(group)}")
+
+        top = self.top.copy()
+        top["group_order"] = top.group.map(self.group_order)
+        top["position_in_group"] = top.groupby("group").cumcount()
+        triples = pd.concat(self.triples, ignore_index=True).merge(top[["subject", "shard", "group_order", "position_in_group"]], on=["subject", "shard"])
+        if self.predicate_order is not None:
+            triples["predicate_order"] = triples.predicate.map(self.predicate_order)
+        else:
+            # In order of first appearance within the entity.
+            triples["predicate_order"] = triples.groupby(["subject", "predicate"]).position.transform("min")
+        triples = triples.sort_values(["group_order", "position_in_group", "predicate_order", "position"], kind="mergesort")
+        return pd.DataFrame({0: decode_column(triples.subject).values, 1: decode_column(triples.predicate).values,
+            2: decode_column(triples.object).values})
+
+def extract(config: Dict, shards: Optional[Iterable[Dict[str, EntData]]] = None) -> pd.DataFrame:
+    extractor = Extractor(config)
+    shards = shards if shards is not None else iter_pickles(Path(config["source"]))
+    for number, shard in enumerate(shards):
+        extractor.add_shard(shard, number)
+    print(f"Parsed {extractor.seen} entities")
+    return extractor.result()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Extract a subset of entities and their triples from a parser output")
+    parser.add_argument("config", type=Path, help="Path of the json config")
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f:
+        config = json.load(f)
+    start = time.time()
+    triples = extract(config)
+    triples.to_csv(config["output"], sep="\t", header=False, index=False)
+    print(f"Wrote {len(triples):,} triples to {config['output']} in {time.time() - start:.0f} seconds")
@@ -0,0 +1,203 @@
+"""
+Generate a synthetic Wikidata dump, in the format of 'latest-all.json.gz', to
+measure the parsers without the real dump. The shape of the entities (claims per
+entity, qualifiers, references, languages and the share of humans, women, places
+and coordinates) can be configured, the defaults roughly follow the real dump.
+The same seed always gives the same dump.
+
+    python3 synthdump.py ../data/synthetic-all.json.gz --entities 100000
+"""
+import argparse
+import bz2
+import gzip
+import json
+import random
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+LANGUAGES = ["en", "de", "fr", "es", "it", "nl", "pl", "ru", "sv", "ja", "zh", "pt", "ca", "uk", "ar",
+    "cs", "fi", "hu", "ko", "fa", "he", "id", "tr", "da", "no", "ro", "sr", "vi", "eo", "eu"]
+GREGORIAN = "http://www.wikidata.org/entity/Q1985727"
+JULIAN = "http://www.wikidata.org/entity/Q1985786"
+HUMAN, MALE, FEMALE = "Q5", "Q6581097", "Q6581072"
+
+# Properties of the generic claims by datatype, and how often that datatype occurs.
+PROPERTIES : Dict[str, Tuple[float, List[str]]] = {
+    "wikibase-item": (0.50, ["P31", "P279", "P361", "P527", "P136", "P495", "P407", "P50", "P921", "P1433"]),
+    "external-id": (0.25, ["P214", "P227", "P244", "P268", "P269", "P646", "P2671", "P1417"]),
+    "string": (0.05, ["P528", "P1813", "P356"]),
+    "time": (0.07, ["P571", "P577", "P580", "P582"]),
+    "quantity": (0.07, ["P1082", "P2046", "P2044", "P1128"]),
+    "monolingualtext": (0.04, ["P1476", "P1448", "P1705"]),
+    "commonsMedia": (0.02, ["P18", "P373"]),
+}
+DATATYPES = list(PROPERTIES.keys())
+DATATYPE_WEIGHTS = [PROPERTIES[datatype][0] for datatype in DATATYPES]
+
+# Properties of humans with an item as value, the most frequent first.
+HUMAN_PROPERTIES = ["P106", "P27", "P735", "P734", "P19", "P20", "P69", "P166", "P1412", "P463", "P102", "P54", "P108", "P39"]
+
+WORDS = ["river", "saint", "john", "north", "hill", "castle", "maria", "lake", "new", "old", "van", "de",
+    "park", "church", "station", "school", "anna", "paul", "berg", "city", "island", "bridge", "tower"]
+
+class Generator:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.random = random.Random(args.seed)
+
+    def item(self, limit: int = 0) -> str:
+        """ A random item id, skewed towards small (i.e. popular) ids. """
+        limit = limit or self.args.entities
+        return f"Q{min(int(self.random.paretovariate(0.6)), limit)}"
+
+    def count(self, mean: float) -> int:
+        return int(self.random.expovariate(1 / mean)) if mean > 0 else 0
+
+    def text(self) -> str:
+        return " ".join(self.random.choice(WORDS) for _ in range(self.random.randint(1, 4))).title()
+
+    def time(self, low: int = 1000, high: int = 2020) -> Dict:
+        precision = self.random.choice([9, 10, 11, 11, 11])
+        calendar = JULIAN if self.random.random() < 0.05 else GREGORIAN
+        year = self.random.randint(low, high)
+        return {"time": f"+{year:04d}-{self.random.randint(1, 12):02d}-{self.random.randint(1, 28):02d}T00:00:00Z",
+            "timezone": 0, "before": 0, "after": 0, "precision": precision, "calendarmodel": calendar}
+
+    def datavalue(self, datatype: str, value=None) -> Dict:
+        if datatype == "wikibase-item":
+            item = value or self.item()
+            return {"value": {"entity-type": "item", "numeric-id": int(item[1:]), "id": item}, "type": "wikibase-entityid"}
+        if datatype == "time":
+            return {"value": value or self.time(), "type": "time"}
+        if datatype == "quantity":
+            return {"value": {"amount": f"+{self.random.randint(1, 10**6)}", "unit": "1"}, "type": "quantity"}
+        if datatype == "monolingualtext":
+            return {"value": {"text": self.text(), "language": self.random.choice(LANGUAGES[:5])}, "type": "monolingualtext"}
+        if datatype == "globe-coordinate":
+            return {"value": {"latitude": self.random.uniform(-90, 90), "longitude": self.random.uniform(-180, 180),
+                "altitude": None, "precision": 0.0001, "globe": "http://www.wikidata.org/entity/Q2"}, "type": "globecoordinate"}
+        return {"value": value or f"{self.random.randint(1, 10**8)}", "type": "string"}
+
+    def snak(self, prop: str, datatype: str, value=None) -> Dict:
+        snak = {"snaktype": "value", "property": prop, "datatype": datatype}
+        # A few claims have an unknown or no value.
+        if value is None and self.random.random() < 0.01:
+            snak["snaktype"] = self.random.choice(["somevalue", "novalue"])
+            return snak
+        snak["datavalue"] = self.datavalue(datatype, value)
+        return snak
+
+    def claim(self, entity_id: str, prop: str, datatype: str, value=None) -> Dict:
+        claim = {"mainsnak": self.snak(prop, datatype, value), "type": "statement",
+            "id": f"{entity_id}${self.random.getrandbits(64):016x}", "rank": "normal"}
+        if self.random.random() < self.args.qualifiers:
+            qualifier = self.random.choice(["P580", "P582", "P585"])
+            claim["qualifiers"] = {qualifier: [self.snak(qualifier, "time")]}
+            claim["qualifiers-order"] = [qualifier]
+        if self.random.random() < self.args.references:
+            claim["references"] = [self.reference() for _ in range(1 + self.count(0.3))]
+        return claim
+
+    def reference(self) -> Dict:
+        if self.random.random() < 0.6:
+            snaks = {"P248": [self.snak("P248", "wikibase-item", self.item(1000))], "P813": [self.snak("P813", "time", self.time(2012))]}
+        else:
+            snaks = {"P854": [self.snak("P854", "url", f"https://example.org/{self.random.getrandbits(32)}")]}
+        return {"hash": f"{self.random.getrandbits(160):040x}", "snaks": snaks, "snaks-order": list(snaks.keys())}
+
+    def add(self, claims: Dict[str, List], entity_id: str, prop: str, datatype: str, value=None) -> None:
+        claims.setdefault(prop, []).append(self.claim(entity_id, prop, datatype, value))
+
+    def human_claims(self, entity_id: str, claims: Dict[str, List]) -> None:
+        self.add(claims, entity_id, "P31", "wikibase-item", HUMAN)
+        gender = FEMALE if self.random.random() < self.args.women else MALE
+        self.add(claims, entity_id, "P21", "wikibase-item", gender)
+        self.add(claims, entity_id, "P569", "time")
+        if self.random.random() < 0.4:
+            self.add(claims, entity_id, "P570", "time")
+        for _ in range(self.count(self.args.claims / 2)):
+            # Skewed towards the frequent properties.
+            prop = HUMAN_PROPERTIES[min(int(self.random.expovariate(0.4)), len(HUMAN_PROPERTIES) - 1)]
+            self.add(claims, entity_id, prop, "wikibase-item")
+
+    def place_claims(self, entity_id: str, claims: Dict[str, List]) -> None:
+        self.add(claims, entity_id, "P31", "wikibase-item", self.random.choice(["Q515", "Q532", "Q3957", "Q6256"]))
+        self.add(claims, entity_id, "P17", "wikibase-item", self.item(300))
+        if self.random.random() < 0.7:
+            self.add(claims, entity_id, "P131", "wikibase-item")
+
+    def terms(self, mean: float) -> Dict[str, Dict]:
+        languages = LANGUAGES[:max(1, min(len(LANGUAGES), self.count(mean)))]
+        return {language: {"language": language, "value": self.text()} for language in languages}
+
+    def entity(self, number: int) -> Dict:
+        entity_id = f"Q{number}"
+        claims : Dict[str, List] = {}
+        kind = self.random.random()
+        if kind < self.args.humans:
+            self.human_claims(entity_id, claims)
+        elif kind < self.args.humans + self.args.places:
+            self.place_claims(entity_id, claims)
+        if self.random.random() < self.args.coordinates:
+            self.add(claims, entity_id, "P625", "globe-coordinate")
+
+        for _ in range(self.count(self.args.claims)):
+            datatype = self.random.choices(DATATYPES, DATATYPE_WEIGHTS)[0]
+            self.add(claims, entity_id, self.random.choice(PROPERTIES[datatype][1]), datatype)
+
+        sitelinks = {}
+        for language in LANGUAGES[:min(len(LANGUAGES), self.count(self.args.sitelinks))]:
+            badges = ["Q17437796"] if self.random.random() < 0.02 else []
+            sitelinks[f"{language}wiki"] = {"site": f"{language}wiki", "title": self.text(), "badges": badges}
+
+        aliases = {language: [term] for language, term in self.terms(self.args.languages / 4).items()}
+        return {"type": "item", "id": entity_id, "labels": self.terms(self.args.languages),
+            "descriptions": self.terms(self.args.languages / 2), "aliases": aliases,
+            "claims": claims, "sitelinks": sitelinks, "lastrevid": self.random.randint(1, 10**9)}
+
+    def property(self, number: int) -> Dict:
+        return {"type": "property", "datatype": self.random.choice(DATATYPES), "id": f"P{number}",
+            "labels": self.terms(self.args.languages), "descriptions": self.terms(self.args.languages / 2),
+            "aliases": {}, "claims": {}, "lastrevid": self.random.randint(1, 10**9)}
+
+def open_target(path: Path, level: int):
+    if path.suffix == ".gz":
+        return gzip.open(path, "wt", encoding="utf-8", compresslevel=level)
+    if path.suffix == ".bz2":
+        return bz2.open(path, "wt", encoding="utf-8", compresslevel=level)
+    raise ValueError(f"can only write '.gz' and '.bz2' dumps, not '{path.name}'")
+
+def generate(args: argparse.Namespace) -> None:
+    generator = Generator(args)
+    with open_target(args.target, args.level) as f:
+        f.write("[\n")
+        # The properties come after the items, as in the real dump.
+        count = args.entities + args.properties
+        for i in range(count):
+            entity = generator.entity(i + 1) if i < args.entities else generator.property(i - args.entities + 1)
+            f.write(json.dumps(entity, ensure_ascii=False, separators=(",", ":")))
+            f.write(",\n" if i < count - 1 else "\n")
+            if (i + 1) % 100_000 == 0:
+                print(f"{i + 1:,} entities written")
+        f.write("]\n")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a synthetic Wikidata JSON dump")
+    parser.add_argument("target", type=Path, help="Path of the dump, '.json.gz' or '.json.bz2'")
+    parser.add_argument("--entities", dest="entities", type=int, help="# items", default=100_000)
+    parser.add_argument("--properties", dest="properties", type=int, help="# properties after the items", default=100)
+    parser.add_argument("--claims", dest="claims", type=float, help="Mean # generic claims per item", default=12)
+    parser.add_argument("--qualifiers", dest="qualifiers", type=float, help="Share of claims with a qualifier", default=0.1)
+    parser.add_argument("--references", dest="references", type=float, help="Share of claims with references", default=0.5)
+    parser.add_argument("--languages", dest="languages", type=float, help="Mean # languages with a label", default=8)
+    parser.add_argument("--sitelinks", dest="sitelinks", type=float, help="Mean # sitelinks", default=2)
+    parser.add_argument("--humans", dest="humans", type=float, help="Share of humans among the items", default=0.1)
+    parser.add_argument("--women", dest="women", type=float, help="Share of women among the humans", default=0.2)
+    parser.add_argument("--places", dest="places", type=float, help="Share of places (with P17/P131) among the items", default=0.1)
+    parser.add_argument("--coordinates", dest="coordinates", type=float, help="Share of items with coordinates (P625)", default=0.1)
+    parser.add_argument("--seed", dest="seed", type=int, help="Seed of the random generator", default=0)
+    parser.add_argument("--level", dest="level", type=int, help="Compression level", default=6)
+    args = parser.parse_args()
+
+    generate(args)
+    print(f"Wrote {args.entities + args.properties:,} entities to {args.target}")
@@ -1,11 +1,15 @@
-import gzip
 import pathlib
 import time
 from typing import List
-from entityparsers.entity import EntData
 
 from entityparsers.manager import DataMgr
-from helper import check_progress, read_lines, running_time
+from entityparsers.sinks import ShardWriter
+from decoders import BACKENDS, resolve_backend
+from decompress import METHODS, resolve_method
+from dumpindex import open_dump, read_index
+from helper import check_progress, dump_due, running_time
+from metrics import Metrics
+from workers import process_parallel, process_serial
 
 import argparse
 
@@ -16,50 +20,112 @@ if __name__ == '__main__':
     # Initialize parser.
     data = DataMgr()
     parser = argparse.ArgumentParser(description="Wikidata entity parsing")
-    parser.add_argument("parser", type=str, choices=data.get_parsers())
+    parser.add_argument("parser", type=str, nargs="+", choices=data.get_parsers(), help="One or more parsers, which all run in a single pass over the dump")
+    parser.add_argument("--dump", dest="dump", type=pathlib.Path, help="Path of the Wikidata JSON dump", default=target)
     parser.add_argument("--skip", dest="skip", type=int, help="# entities to skip", default=0)
+    parser.add_argument("--resume", dest="resume", action="store_true", help="Continue from the last dump of this parser", default=False)
+    parser.add_argument("--workers", dest="workers", type=int, help="# processes used for decoding & parsing", default=1)
+    parser.add_argument("--batch-mb", dest="batch_mb", type=int, help="Max. MB of raw lines read per batch", default=64)
+    parser.add_argument("--dump-entities", dest="dump_entities", type=int, help="Dump a parser once it holds this many entities", default=1_000_000)
+    parser.add_argument("--dump-mb", dest="dump_mb", type=int, help="Dump all parsers once their entities take an estimated # MB, 0 for no limit", default=2048)
+    parser.add_argument("--format", dest="format", type=str, choices=data.get_formats(), help="Output format of the dumps", default="pickle")
+    parser.add_argument("--ids", dest="ids", type=pathlib.Path, help="Table of Wikidata identifiers shared by the columnar outputs", default=pathlib.Path("ids.txt"))
+    parser.add_argument("--decompress", dest="decompress", type=str, choices=["auto"] + METHODS, help="Decompression of the dump, 'auto' picks the fastest available one", default="auto")
+    parser.add_argument("--decompress-threads", dest="decompress_threads", type=int, help="# threads decompressing an indexed dump with '--decompress threads'", default=4)
+    parser.add_argument("--metrics", dest="metrics", type=pathlib.Path, help="Append the time spent per stage to this json lines file", default=None)
+    parser.add_argument("--metrics-interval", dest="metrics_interval", type=float, help="Seconds between two lines of metrics", default=60.0)
+    parser.add_argument("--profile-dir", dest="profile_dir", type=pathlib.Path, help="Write cProfile profiles of sampled batches to this folder", default=None)
+    parser.add_argument("--profile-every", dest="profile_every", type=int, help="Profile every n-th batch, with --profile-dir", default=10)
+    parser.add_argument("--json", dest="json", type=str, choices=["auto"] + BACKENDS, help="Json decoder, 'auto' picks the fastest installed one", default="auto")
+    parser.add_argument("--json-input", dest="json_input", type=str, choices=["bytes", "str"], help="Pass raw bytes to the decoder, or decode to str first", default="bytes")
     args = parser.parse_args()
-    data.set_parser(args.parser)
+
+    # Every parser gets its own manager, with its own counters & output. The
+    # dumps of all parsers are written by a single background thread.
+    writer = ShardWriter()
+    managers : List[DataMgr] = []
+    for name in dict.fromkeys(args.parser):
+        data = DataMgr()
+        data.set_parser(name)
+        data.set_format(args.format)
+        data.set_ids(args.ids)
+        data.set_writer(writer)
+        managers.append(data)
+    try:
+        backend, from_bytes = resolve_backend(args.json), args.json_input == "bytes"
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Decoding json with '{backend}' from {args.json_input}")
+    try:
+        decompress = resolve_method(args.decompress, args.dump, read_index(args.dump), args.decompress_threads)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Decompressing with '{decompress}'")
+
+    skip = args.skip
+    if args.resume:
+        missing = [data.selected_parser for data in managers if not data.has_checkpoint(data.selected_parser)]
+        if len(missing) > 0:
+            parser.error(f"there is no checkpoint to resume {', '.join(missing)} from, run without --resume")
+        # The parsers of a run are dumped together. When a run stopped while their checkpoints
+        # were being written, it is resumed from the earliest one and the others are rolled back.
+        skip = min(data.read_checkpoint(data.selected_parser) for data in managers)
+        try:
+            for data in managers:
+                data.read_checkpoint(data.selected_parser, skip)
+        except ValueError as e:
+            parser.error(f"{e}, resume the parsers separately")
+        for data in managers:
+            print(f"Resuming {data.selected_parser} after {skip:,} entities, {data.get_size():,} saved")
+    else:
+        for data in managers:
+            data.start_at(skip)
 
     start_time = time.time() 
     iter_time = time.time()
+    metrics = Metrics(args.metrics, args.metrics_interval, args.profile_dir, args.profile_every)
     
     passed : int = 0
-    with gzip.open(target) as f:
-        # Skip the first x entities
-        for i in range(args.skip):
-            if i % 1_000_000 == 0:
-                print(f"skipping: {i:,}")
-            f.readline()
-
-        lines = read_lines(f)
-        while True:
-            # Stop at the end of the file.
-            if len(lines) == 0:
-                break;
+    # Skip the first x entities, this is fast if the dump was indexed with dumpindex.py.
+    with open_dump(args.dump, skip, decompress, args.decompress_threads) as f:
+        max_bytes = args.batch_mb * 2**20
+        if args.workers > 1:
+            batches = process_parallel(f, managers, args.workers, backend, from_bytes, max_bytes, metrics)
+        else:
+            batches = process_serial(f, managers, backend, from_bytes, max_bytes, metrics)
 
-            # Process this batch
-            entities : List[EntData] = list(filter(None, map(data.process_entity, lines)))
-            data.add_entities({ent.id : ent for ent in entities})
+        for batch in batches:
+            with metrics.stage("merge"):
+                for data, entities in zip(managers, batch):
+                    data.add_entities({ent.id : ent for ent in entities})
             
             # Keep us posted every 100k.
-            major, minor = check_progress(data, passed, iter_time, start_time)
-            if minor:
+            if check_progress(managers, passed, iter_time, start_time):
                 iter_time = time.time()
                 passed += 1
-            if major:
-                passed = 0
 
-            # Read the next lines.
-            lines = read_lines(f)
+            # Dump once the entities of a parser, or of all parsers together, exceed the budget.
+            # All parsers are dumped at the same entity, so their checkpoints agree.
+            with metrics.stage("dump"):
+                if dump_due(managers, args.dump_entities, args.dump_mb * 2**20):
+                    for data in managers:
+                        print(f"Dumping {data.get_pending():,} entities of {data.selected_parser}")
+                        data.dump_current(data.selected_parser)
+            metrics.end_batch(managers)
         
     # Final dump.
-    data.dump_current(data.selected_parser)
+    with metrics.stage("dump"):
+        for data in managers:
+            data.dump_current(data.selected_parser)
+        writer.close()
+    metrics.emit(managers)
 
     # Final update.
     total_mins, total_secs = running_time(start_time)
     print(f"Finished running in {total_mins}:{total_secs}")
-    print(f"Found {data.get_processed()} entities")
+    for data in managers:
+        print(f"{data.selected_parser}: Found {data.get_processed()} entities, saved {data.get_size()}")
+        print(f"{data.selected_parser}: Skipped {data.get_filtered()} entities with the prefilter")
 
 
 
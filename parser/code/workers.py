@@ -0,0 +1,136 @@
+import time
+from collections import defaultdict
+from multiprocessing import Pool
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from decoders import Decoder, get_decoder
+from entityparsers.entity import EntData
+from entityparsers.manager import DataMgr
+from helper import BATCH_BYTES, iter_batches, iter_entities, split_batch
+from metrics import Metrics, profiled
+
+# Seconds spent per stage.
+Timings = Dict[str, float]
+
+# Every worker process holds its own managers and decoder, set up once by the pool initializer.
+_managers : List[DataMgr] = []
+_decode : Optional[Decoder] = None
+_detailed = False
+
+def init_worker(parsers: List[str], backend: str, from_bytes: bool, detailed: bool = False) -> None:
+    global _managers, _decode, _detailed
+    _detailed = detailed
+    _managers = []
+    for parser in parsers:
+        data = DataMgr()
+        data.set_parser(parser)
+        _managers.append(data)
+    _decode = get_decoder(backend, from_bytes)
+
+def process_chunk(lines: List[bytes], profile: Optional[str] = None) -> Tuple[List[Tuple[int, int, List[EntData]]], Timings]:
+    """ Decode and parse a chunk of raw lines. Returns, for every parser, the
+        number of entities processed, the number rejected by the prefilter and
+        the entities the parser kept, and the time spent per stage. """
+    timings : Optional[Timings] = defaultdict(float) if _detailed else None
+    before = [(data.get_processed(), data.get_filtered()) for data in _managers]
+    with profiled(profile):
+        batches = parse_lines(_managers, lines, _decode, timings)
+    return [(data.get_processed() - processed, data.get_filtered() - filtered, entities)
+        for data, (processed, filtered), entities in zip(_managers, before, batches)], dict(timings or {})
+
+def parse_lines(managers: List[DataMgr], lines: List[bytes], decode: Decoder, timings: Optional[Timings] = None) -> List[List[EntData]]:
+    """ Run every parser over the lines. A line is decoded at most once, and
+        only if the prefilter of at least one of the parsers accepts it. With
+        `timings`, the time of every stage is added to it. """
+    if timings is not None:
+        return parse_lines_timed(managers, lines, decode, timings)
+
+    if len(managers) == 1:
+        data = managers[0]
+        return [list(filter(None, map(data.process_entity, iter_entities(filter(data.accept_line, lines), decode))))]
+
+    batches : List[List[EntData]] = [[] for _ in managers]
+    for line in lines:
+        accepted = [i for i, data in enumerate(managers) if data.accept_line(line)]
+        if len(accepted) == 0:
+            continue
+        ent_data = decode(line)
+        for i in accepted:
+            entity = managers[i].process_entity(ent_data)
+            if entity is not None:
+                batches[i].append(entity)
+    return batches
+
+def parse_lines_timed(managers: List[DataMgr], lines: List[bytes], decode: Decoder, timings: Timings) -> List[List[EntData]]:
+    clock = time.perf_counter
+    stages = [f"parse.{data.selected_parser}" for data in managers]
+    batches : List[List[EntData]] = [[] for _ in managers]
+    for line in lines:
+        start = clock()
+        accepted = [i for i, data in enumerate(managers) if data.accept_line(line)]
+        end = clock()
+        timings["prefilter"] += end - start
+        if len(accepted) == 0:
+            continue
+
+        start = end
+        ent_data = decode(line)
+        end = clock()
+        timings["decode"] += end - start
+        for i in accepted:
+            start = end
+            entity = managers[i].process_entity(ent_data)
+            end = clock()
+            timings[stages[i]] += end - start
+            if entity is not None:
+                batches[i].append(entity)
+    return batches
+
+def process_serial(file: Iterable[bytes], managers: List[DataMgr], backend: str, from_bytes: bool, max_bytes: int = BATCH_BYTES,
+        metrics: Optional[Metrics] = None) -> Iterator[List[List[EntData]]]:
+    metrics = metrics if metrics is not None else Metrics()
+    decode = get_decoder(backend, from_bytes)
+    for lines in metrics.timed(iter_batches(file, max_bytes), "read"):
+        timings : Optional[Timings] = defaultdict(float) if metrics.detailed else None
+        with profiled(metrics.profile_path(metrics.batches)):
+            batch = parse_lines(managers, lines, decode, timings)
+        metrics.merge(timings or {})
+        yield batch
+
+def process_parallel(file: Iterable[bytes], managers: List[DataMgr], workers: int, backend: str, from_bytes: bool, max_bytes: int = BATCH_BYTES,
+        metrics: Optional[Metrics] = None) -> Iterator[List[List[EntData]]]:
+    """ Decompress in this process and fan the decoding/parsing out to a pool of
+        workers. Batches are yielded in file order, with the entities of every
+        parser, and the counters of the managers are updated as if the entities
+        were processed here. At most two batches of raw lines are held in memory
+        at a time. """
+    metrics = metrics if metrics is not None else Metrics()
+    parsers = [data.selected_parser for data in managers]
+    with Pool(workers, initializer=init_worker, initargs=(parsers, backend, from_bytes, metrics.detailed)) as pool:
+        raw_batches = metrics.timed(iter_batches(file, max_bytes), "read")
+        submitted = 0
+        def submit(batch: Optional[List[bytes]]):
+            nonlocal submitted
+            if batch is None:
+                return None
+            profile = metrics.profile_path(submitted)
+            submitted += 1
+            chunks = [(chunk, f"{profile}-{i:03d}" if profile is not None else None) for i, chunk in enumerate(split_batch(batch, workers))]
+            return pool.starmap_async(process_chunk, chunks)
+
+        pending = submit(next(raw_batches, None))
+        while pending is not None:
+            # Decompress the next batch while the pool works on the current one.
+            upcoming = submit(next(raw_batches, None))
+
+            with metrics.stage("wait"):
+                chunks = pending.get()
+            batches : List[List[EntData]] = [[] for _ in managers]
+            for results, timings in chunks:
+                metrics.merge(timings)
+                for data, batch, (processed, filtered, entities) in zip(managers, batches, results):
+                    data.merge_counts(processed, len(entities), filtered)
+                    batch.extend(entities)
+            yield batches
+
+            pending = upcoming
@@ -0,0 +1,110 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+# The parsers import the manager, which imports all parsers, so it goes first.
+from entityparsers.manager import DataMgr
+from entityparsers.sinks import iter_pickles, read_manifest
+
+CODE = Path(__file__).resolve().parent.parent.joinpath("code")
+PARSERS = ["human", "label"]
+
+
+@pytest.fixture(scope="module")
+def dump(tmp_path_factory) -> Path:
+    path = tmp_path_factory.mktemp("dump").joinpath("dump.json.gz")
+    subprocess.run([sys.executable, str(CODE.joinpath("synthdump.py")), str(path), "--entities", "3000"],
+        check=True, stdout=subprocess.DEVNULL)
+    return path
+
+
+def parser_args(dump: Path, *args: str) -> List[str]:
+    # Small dumps and batches, so the run is checkpointed many times.
+    return [sys.executable, str(CODE.joinpath("wikidata_parser.py")), *PARSERS, "--dump", str(dump),
+        "--batch-mb", "1", "--dump-entities", "200", *args]
+
+
+def run_parser(cwd: Path, dump: Path, *args: str) -> None:
+    cwd.mkdir(exist_ok=True)
+    subprocess.run(parser_args(dump, *args), cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+
+
+def read_outputs(cwd: Path) -> Dict[str, List]:
+    """ The records of every entity in the output of every parser, in order. """
+    outputs = {}
+    for name in PARSERS:
+        root = cwd.joinpath(f"{name}.shards")
+        shards = read_manifest(root)
+        assert [entry["first"] for entry in shards[1:]] == [entry["last"] for entry in shards[:-1]]
+        outputs[name] = [(entity.id, list(entity.records())) for shard in iter_pickles(root) for entity in shard.values()]
+    return outputs
+
+
+def read_checkpoint(cwd: Path, name: str) -> Dict:
+    with open(cwd.joinpath(f"{name}.ckpt"), "r") as f:
+        return json.load(f)
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo") or shutil.which("gzip") is None, reason="needs a named pipe and gzip")
+def test_resume_after_kill(dump: Path, tmp_path: Path):
+    run_parser(tmp_path.joinpath("complete"), dump)
+
+    # Feed half of the dump through a pipe, and kill the run once it has been checkpointed.
+    killed = tmp_path.joinpath("killed")
+    killed.mkdir()
+    pipe = killed.joinpath("pipe.json.gz")
+    os.mkfifo(pipe)
+    # The gzip module needs to seek, so the pipe is read by the gzip tool.
+    process = subprocess.Popen(parser_args(pipe, "--decompress", "gzip"), cwd=killed, stdout=subprocess.DEVNULL)
+    with open(pipe, "wb") as f:
+        data = dump.read_bytes()
+        f.write(data[:len(data) // 2])
+        f.flush()
+        deadline = time.time() + 60
+        while not all(killed.joinpath(f"{name}.ckpt").is_file() for name in PARSERS):
+            assert time.time() < deadline and process.poll() is None
+            time.sleep(0.01)
+        process.kill()
+        process.wait()
+
+    run_parser(killed, dump, "--resume")
+    assert read_outputs(killed) == read_outputs(tmp_path.joinpath("complete"))
+
+
+def test_resume_between_checkpoints(dump: Path, tmp_path: Path):
+    complete = tmp_path.joinpath("complete")
+    run_parser(complete, dump)
+
+    # A run stopped after the last shard of human was listed, but before its checkpoint
+    # moved, while label was already checkpointed.
+    run_parser(tmp_path.joinpath("stopped"), dump)
+    stopped = tmp_path.joinpath("stopped")
+    previous = read_checkpoint(stopped, "human")["previous"]
+    assert previous["processed"] < read_checkpoint(stopped, "label")["processed"]
+    with open(stopped.joinpath("human.ckpt"), "w") as f:
+        json.dump(previous, f)
+
+    run_parser(stopped, dump, "--resume")
+    assert read_checkpoint(stopped, "human")["processed"] == read_checkpoint(complete, "human")["processed"]
+    assert read_outputs(stopped) == read_outputs(complete)
+
+
+def test_resume_without_checkpoint(dump: Path, tmp_path: Path):
+    run = subprocess.run(parser_args(dump, "--resume"), cwd=tmp_path, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    assert run.returncode == 2
+    assert "no checkpoint to resume human, label from" in run.stderr
+
+    # Only label has a checkpoint, so human can not be resumed.
+    with open(tmp_path.joinpath("label.ckpt"), "w") as f:
+        json.dump({"processed": 0, "saved": 0, "filtered": 0}, f)
+    run = subprocess.run(parser_args(dump, "--resume"), cwd=tmp_path, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    assert run.returncode == 2
+    assert "no checkpoint to resume human from" in run.stderr
+    assert "Traceback" not in run.stderr